@@ -0,0 +1,73 @@
+"""Benchmark do tamanho de lote das buscas $in da conciliação.
+
+Para uma amostra de empréstimos liquidados, compara a busca individual (find_one
+por empréstimo) com consultas $in por lote de diferentes tamanhos, medindo tempo,
+número de consultas enviadas e empréstimos por segundo.
+
+Uso:
+    python benchmarks/bench_batch_lookup.py --sample 20000 --sizes 50 100 500 1000 2000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from pymongo import MongoClient
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from main import (  # noqa: E402
+    LIQUIDATED_PROJECTION,
+    chunk_keys,
+    fetch_internal_statuses,
+    fetch_stock_keys,
+    get_internal_loan,
+    get_stock_loan,
+    loan_keys,
+)
+
+
+def report(label, queries, elapsed, total):
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"{label:<28} consultas={queries:>8,}  tempo={elapsed:8.3f}s  {rate:>12,.0f} empréstimos/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--sample', type=int, default=10000, help="Quantidade de empréstimos liquidados")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 500, 1000, 2000],
+                        help="Tamanhos de lote a comparar")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    loans = client['open']['loans']
+    settled = client['investment_funds']['liquidated']
+    stock = client['investment_funds']['stock']
+
+    sample = list(settled.find({}, LIQUIDATED_PROJECTION).limit(args.sample))
+    print(f"Amostra: {len(sample)} empréstimos liquidados\n")
+
+    # Linha de base: duas consultas por empréstimo, sem cache
+    start = time.perf_counter()
+    for loan in sample:
+        keys = loan_keys(loan)
+        get_internal_loan.__wrapped__(keys, loans)
+        get_stock_loan.__wrapped__(keys, stock)
+    report("find_one por empréstimo", 2 * len(sample), time.perf_counter() - start, len(sample))
+
+    for size in args.sizes:
+        queries = 0
+        start = time.perf_counter()
+        for offset in range(0, len(sample), size):
+            keys = chunk_keys(sample[offset:offset + size])
+            fetch_internal_statuses(loans, keys)
+            fetch_stock_keys(stock, keys)
+            queries += 2
+        report(f"$in lote de {size}", queries, time.perf_counter() - start, len(sample))
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark das buscas do caminho quente: documento inteiro x projeção/consulta coberta.
+
+Mede, para uma amostra de documentos liquidados, os bytes enviados pelo servidor
+(serverStatus.network.bytesOut), o tamanho BSON decodificado e o tempo total.
+Só a busca na base interna é coberta pelo índice; no estoque o índice de
+CHAVES_CONCILIACAO é multikey (array) e não cobre consultas, então a projeção
+apenas reduz o documento devolvido. A conciliação consulta o estoque pelo
+KeyIndex em memória, medido à parte (sem rede).
+
+Uso:
+    python benchmarks/bench_projection.py --sample 2000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import bson
+from pymongo import MongoClient
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from main import (  # noqa: E402
+    INTERNAL_KEY_FIELD,
+    INTERNAL_LOAN_PROJECTION,
+    INTERNAL_STATUS_INDEX,
+    LIQUIDATED_PROJECTION,
+    RECONCILIATION_KEYS_FIELD,
+    STOCK_LOAN_PROJECTION,
+)
+from document_keys import document_key  # noqa: E402
+from key_index import KeyIndex  # noqa: E402
+
+
+def bytes_out(client) -> int:
+    return client.admin.command('serverStatus')['network']['bytesOut']
+
+
+def measure(client, label, run):
+    """Executa uma rodada e devolve bytes na rede, bytes BSON e tempo"""
+    before = bytes_out(client)
+    start = time.perf_counter()
+    bson_bytes = run()
+    elapsed = time.perf_counter() - start
+    network = bytes_out(client) - before
+    print(f"{label:<40} rede={network:>14,} B  bson={bson_bytes:>14,} B  tempo={elapsed:8.3f}s")
+    return network
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--sample', type=int, default=1000, help="Quantidade de documentos liquidados")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    loans = client['open']['loans']
+    settled = client['investment_funds']['liquidated']
+    stock = client['investment_funds']['stock']
+    loans.create_index(INTERNAL_STATUS_INDEX)
+    stock.create_index([(RECONCILIATION_KEYS_FIELD, 1)])
+
+    documents = [
+        document_key(doc['DOCUMENTO'])
+        for doc in settled.find({}, {"_id": 0, "DOCUMENTO": 1}).limit(args.sample)
+        if doc.get('DOCUMENTO')
+    ]
+    print(f"Amostra: {len(documents)} documentos\n")
+
+    def lookups(collection, field, projection, hint=None):
+        def run():
+            total = 0
+            kwargs = {'hint': hint} if hint else {}
+            for document in documents:
+                doc = collection.find_one({field: document}, projection, **kwargs)
+                if doc:
+                    total += len(bson.encode(doc))
+            return total
+        return run
+
+    def cursor_scan(projection):
+        def run():
+            total = 0
+            for doc in settled.find({}, projection).limit(args.sample).batch_size(500):
+                total += len(bson.encode(doc))
+            return total
+        return run
+
+    before = measure(client, "interno: documento inteiro", lookups(loans, INTERNAL_KEY_FIELD, None))
+    after = measure(client, "interno: consulta coberta",
+                    lookups(loans, INTERNAL_KEY_FIELD, INTERNAL_LOAN_PROJECTION, INTERNAL_STATUS_INDEX))
+    if before:
+        print(f"{'redução nas buscas internas':<40} {100 * (1 - after / before):.1f}%\n")
+
+    before = measure(client, "estoque: documento inteiro", lookups(stock, RECONCILIATION_KEYS_FIELD, None))
+    after = measure(client, "estoque: projeção _id (não coberta)",
+                    lookups(stock, RECONCILIATION_KEYS_FIELD, STOCK_LOAN_PROJECTION))
+    if before:
+        print(f"{'redução nas buscas no estoque':<40} {100 * (1 - after / before):.1f}%")
+
+    start = time.perf_counter()
+    stock_index = KeyIndex.from_collection(stock, RECONCILIATION_KEYS_FIELD)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    stock_index.contains_many(documents)
+    print(f"{'estoque: KeyIndex em memória':<40} chaves={len(stock_index):>12,}  "
+          f"montagem={built:8.3f}s  consulta={time.perf_counter() - start:8.3f}s\n")
+
+    before = measure(client, "cursor liquidados sem projeção", cursor_scan(None))
+    after = measure(client, "cursor liquidados projetado", cursor_scan(LIQUIDATED_PROJECTION))
+    if before:
+        print(f"{'redução no cursor':<40} {100 * (1 - after / before):.1f}%\n")
+
+    if documents:
+        plan = loans.find(
+            {INTERNAL_KEY_FIELD: documents[0]}, INTERNAL_LOAN_PROJECTION
+        ).hint(INTERNAL_STATUS_INDEX).limit(1).explain()
+        stats = plan['executionStats']
+        print(f"Consulta interna coberta: totalDocsExamined={stats['totalDocsExamined']}, "
+              f"totalKeysExamined={stats['totalKeysExamined']}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,16 @@ from langchain.tools import Tool
 from pathlib import Path
 import sys
 import importlib.util
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient
 from typing import List, Dict
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor
-from functools import lru_cache
+from functools import lru_cache, wraps
+import hashlib
+import re
+import unicodedata
+from collections import deque
+import asyncio
 import json
 from datetime import datetime
 import subprocess
@@ -18,6 +23,20 @@ import time
 # Adiciona o diretório tools ao PYTHONPATH
 tools_path = os.path.join(os.path.dirname(__file__), 'tools/processamento_de_dados')
 sys.path.append(tools_path)
+analysis_path = os.path.join(os.path.dirname(__file__), 'tools/analise_de_dados')
+sys.path.append(analysis_path)
+
+from results_store import ResultsStore, query_inconsistencies
+from key_index import KeyIndex, collection_fingerprint, load_or_build
+from spill import SpillableDailySummary
+from document_keys import INTERNAL_KEY_FIELD, RECONCILIATION_KEYS_FIELD, document_keys_only, reconciliation_keys
+from index_spec import INTERNAL_STATUS_INDEX, apply_indexes, format_index_report
+from data_files import DATA_FILES
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # modo assíncrono indisponível sem o pacote motor
+    AsyncIOMotorClient = None
 
 # Carrega as variáveis de ambiente
 load_dotenv()
@@ -27,6 +46,23 @@ BATCH_SIZE = 500  # Reduzindo o tamanho do lote para menor uso de memória
 MAX_WORKERS = 2   # Reduzindo o número de workers para evitar sobrecarga
 CACHE_SIZE = 100  # Limitando o tamanho do cache
 
+# Modo de conciliação: 'sync' (padrão) ou 'async' (Motor, buscas $in concorrentes)
+RECONCILIATION_MODE = os.getenv('RECONCILIATION_MODE', 'sync').lower()
+ASYNC_MAX_CONCURRENCY = int(os.getenv('ASYNC_MAX_CONCURRENCY', '8'))  # Buscas em lote simultâneas
+LOOKUP_BATCH_SIZE = int(os.getenv('LOOKUP_BATCH_SIZE', str(BATCH_SIZE)))  # Empréstimos por consulta $in
+
+# Orçamento de memória da conciliação em MB (0 = sem limite). Metade vai para o índice de
+# estoque e 10% para cada sumário diário; acima disso os dados vão para disco.
+MEMORY_BUDGET_MB = int(os.getenv('MEMORY_BUDGET_MB', '0'))
+STOCK_KEY_BYTES = 96  # Estimativa por chave no índice de estoque (até 32 bytes em dtype 'S', com as cópias da ordenação)
+
+# Projeções do caminho quente: apenas os campos realmente lidos na conciliação
+INTERNAL_LOAN_PROJECTION = {"_id": 0, INTERNAL_KEY_FIELD: 1, "contract_status": 1}
+# CHAVES_CONCILIACAO é um array (índice multikey), então a busca no estoque não é coberta:
+# a projeção só reduz o documento devolvido. A conciliação usa o KeyIndex em memória.
+STOCK_LOAN_PROJECTION = {"_id": 1}
+LIQUIDATED_PROJECTION = {"_id": 0, "DOCUMENTO": 1, "DATA_MOVIMENTO": 1, RECONCILIATION_KEYS_FIELD: 1}
+
 # Definir o diretório base do projeto e criar pasta results
 BASE_DIR = Path(__file__).resolve().parent
 RESULTS_DIR = BASE_DIR / 'results'
@@ -34,6 +70,21 @@ RESULTS_DIR.mkdir(exist_ok=True)
 
 print(f"Pasta 'results' criada/verificada em: {RESULTS_DIR}")
 
+# Índice de chaves do estoque reaproveitado entre execuções enquanto a collection não muda
+STOCK_KEY_INDEX_PATH = RESULTS_DIR / '.cache' / 'stock_keys.npy'
+# Arquivos temporários do modo com orçamento de memória
+SPILL_DIR = RESULTS_DIR / '.spill'
+# Memoização das ferramentas do CrewAI e saídas completas devolvidas por caminho
+TOOL_CACHE_DIR = RESULTS_DIR / '.tool_cache'
+TOOL_OUTPUT_DIR = RESULTS_DIR / 'tool_outputs'
+TOOL_SUMMARY_LINES = 20  # Saídas maiores que isso voltam ao LLM resumidas
+
+def memory_budget_bytes(share: float) -> int:
+    """Parte do orçamento de memória em bytes (None quando não há limite)"""
+    if MEMORY_BUDGET_MB <= 0:
+        return None
+    return int(MEMORY_BUDGET_MB * 1024 * 1024 * share)
+
 def ensure_mongodb_running():
     """Verifica se o MongoDB está rodando e inicia se necessário"""
     try:
@@ -77,15 +128,26 @@ def ensure_mongodb_running():
                 print(f"Erro ao iniciar MongoDB: {str(e)}")
                 return False
 
+def loan_keys(loan: Dict) -> tuple:
+    """Chaves tipadas de um empréstimo liquidado (DOC:DOCUMENTO e SN:SEU_NUMERO)"""
+    return tuple(loan.get(RECONCILIATION_KEYS_FIELD) or reconciliation_keys(loan.get('DOCUMENTO')))
+
 @lru_cache(maxsize=CACHE_SIZE)
-def get_internal_loan(ccb_number: str, loans_collection) -> Dict:
-    """Cache para busca de empréstimos internos"""
-    return loans_collection.find_one({"ccb_number": ccb_number})
+def get_internal_loan(keys: tuple, loans_collection) -> Dict:
+    """Cache para busca de empréstimos internos (consulta coberta pelo índice ccb_number_norm+contract_status)"""
+    documents = document_keys_only(keys)
+    if not documents:
+        return None
+    return loans_collection.find_one(
+        {INTERNAL_KEY_FIELD: {"$in": documents}},
+        INTERNAL_LOAN_PROJECTION,
+        hint=INTERNAL_STATUS_INDEX
+    )
 
 @lru_cache(maxsize=CACHE_SIZE)
-def get_stock_loan(document: str, stock_collection) -> Dict:
-    """Cache para busca de empréstimos no estoque"""
-    return stock_collection.find_one({"NU_DOCUMENTO": document})
+def get_stock_loan(keys: tuple, stock_collection) -> Dict:
+    """Cache para busca de empréstimos no estoque pelas chaves tipadas (cada tipo só casa com o mesmo tipo)"""
+    return stock_collection.find_one({RECONCILIATION_KEYS_FIELD: {"$in": list(keys)}}, STOCK_LOAN_PROJECTION)
 
 def process_batch(batch_data: List, func) -> List:
     """Processa um lote de dados"""
@@ -95,52 +157,66 @@ def process_batch(batch_data: List, func) -> List:
     return results
 
 # Funções de processamento de dados
+def run_loader_script(script_name: str) -> Dict:
+    """Executa um script de carga e devolve o resultado exposto em load_stats.
+
+    Os scripts tratam as próprias exceções e apenas imprimem o erro, então a carga só
+    é considerada concluída se todos os registros lidos foram inseridos.
+    """
+    spec = importlib.util.spec_from_file_location(
+        script_name,
+        os.path.join(tools_path, f"{script_name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    stats = getattr(module, 'load_stats', None)
+    if not stats or not stats['inserted']:
+        raise RuntimeError("carga não concluída (ver mensagens do script)")
+    if stats['inserted'] < stats['expected']:
+        raise RuntimeError(f"carga parcial: {stats['inserted']:,} de {stats['expected']:,} registros inseridos")
+    return stats
+
 def process_internal_data() -> str:
     """Processa os dados internos do sistema"""
     try:
-        spec = importlib.util.spec_from_file_location(
-            "script_internal_data", 
-            os.path.join(tools_path, "script_internal_data.py")
-        )
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return "Dados internos processados com sucesso"
+        stats = run_loader_script("script_internal_data")
+        return f"Dados internos processados com sucesso ({stats['inserted']:,} documentos)"
     except Exception as e:
         return f"Erro ao processar dados internos: {str(e)}"
 
 def process_liquidated_data() -> str:
     """Processa os dados de empréstimos liquidados"""
     try:
-        spec = importlib.util.spec_from_file_location(
-            "script_liquidated", 
-            os.path.join(tools_path, "script_liquidated.py")
-        )
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return "Dados de liquidação processados com sucesso"
+        stats = run_loader_script("script_liquidated")
+        return f"Dados de liquidação processados com sucesso ({stats['inserted']:,} documentos)"
     except Exception as e:
         return f"Erro ao processar dados liquidados: {str(e)}"
 
 def process_stock_data() -> str:
     """Processa os dados de estoque atual"""
     try:
-        spec = importlib.util.spec_from_file_location(
-            "script_stock", 
-            os.path.join(tools_path, "script_stock.py")
-        )
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return "Dados de estoque processados com sucesso"
+        stats = run_loader_script("script_stock")
+        return f"Dados de estoque processados com sucesso ({stats['inserted']:,} documentos)"
     except Exception as e:
         return f"Erro ao processar dados de estoque: {str(e)}"
 
+def build_indexes() -> str:
+    """Cria os índices de todas as collections depois das cargas"""
+    try:
+        client = MongoClient('mongodb://localhost:27017/')
+        report = apply_indexes(client)
+        client.close()
+        return format_index_report(report)
+    except Exception as e:
+        return f"Erro ao criar índices: {str(e)}"
+
 # Funções de análise de dados
 def check_loan_inconsistency(loan: Dict, loans_collection, stock_collection) -> List[Dict]:
     """Verifica inconsistências para um empréstimo específico"""
     inconsistencies = []
     
     # Usa cache para buscar empréstimo interno
-    internal_loan = get_internal_loan(loan['DOCUMENTO'], loans_collection)
+    internal_loan = get_internal_loan(loan_keys(loan), loans_collection)
     
     if internal_loan:
         if internal_loan['contract_status'] != 'FULLY_PAID':
@@ -158,7 +234,7 @@ def check_loan_inconsistency(loan: Dict, loans_collection, stock_collection) ->
         })
     
     # Usa cache para verificar no estoque
-    stock_loan = get_stock_loan(loan['DOCUMENTO'], stock_collection)
+    stock_loan = get_stock_loan(loan_keys(loan), stock_collection)
     if stock_loan:
         inconsistencies.append({
             'tipo': 'Conflito Estoque/Liquidação',
@@ -168,26 +244,29 @@ def check_loan_inconsistency(loan: Dict, loans_collection, stock_collection) ->
     
     return inconsistencies
 
-def save_inconsistencies_batch(inconsistencies: List[Dict], date: str, comparison_type: str):
+def save_inconsistencies_batch(inconsistencies: List[Dict], date: str, comparison_type: str, store: ResultsStore = None):
     """Salva um lote de inconsistências em um arquivo JSON, organizado por data e tipo de comparação"""
     # Criar diretórios se não existirem
     base_dir = RESULTS_DIR / comparison_type
     base_dir.mkdir(exist_ok=True)
     
     filepath = base_dir / f"inconsistencies_{date}.json"
+    payload = json.dumps(inconsistencies, indent=2, ensure_ascii=False)
     
-    # Verifica se o arquivo já existe
-    existing_data = []
-    if filepath.exists():
-        with open(filepath, 'r', encoding='utf-8') as f:
-            existing_data = json.load(f)
-    
-    # Adiciona novos dados
-    existing_data.extend(inconsistencies)
+    if not filepath.exists():
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(payload)
+    elif inconsistencies:
+        # Acrescenta ao array JSON do dia sem reler o arquivo: o "]" final dá lugar aos novos itens
+        with open(filepath, 'r+b') as f:
+            f.seek(-2, os.SEEK_END)
+            empty = f.read(2) == b'[]'
+            f.seek(-2, os.SEEK_END)
+            f.write((payload if empty else ',' + payload[1:]).encode('utf-8'))
     
-    # Salva o arquivo atualizado
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(existing_data, f, indent=2, ensure_ascii=False)
+    # Persiste também no SQLite indexado para consultas direcionadas
+    if store is not None:
+        store.insert_many(inconsistencies, comparison_type)
     
     return filepath
 
@@ -265,7 +344,8 @@ def save_general_report(daily_summary: Dict, total_loans: Dict, report_type: str
     return report
 
 # Funções de comparação de bancos
-def compare_internal_liquidated(loan: Dict, loans_collection, daily_summary: Dict, date_str: str) -> List[Dict]:
+def compare_internal_liquidated(loan: Dict, loans_collection, daily_summary: Dict, date_str: str,
+                                internal_statuses: Dict = None) -> List[Dict]:
     """Verifica inconsistências entre base liquidada e base interna"""
     current_inconsistencies = []
     
@@ -273,8 +353,14 @@ def compare_internal_liquidated(loan: Dict, loans_collection, daily_summary: Dic
     if not ccb_number:
         return []
         
-    # Verificar na base interna
-    internal_loan = get_internal_loan(ccb_number, loans_collection)
+    # Verificar na base interna (pelo mapa chave -> status já buscado, quando disponível)
+    if internal_statuses is not None:
+        internal_loan = next(
+            ({'contract_status': internal_statuses[key]} for key in loan_keys(loan) if key in internal_statuses),
+            None
+        )
+    else:
+        internal_loan = get_internal_loan(loan_keys(loan), loans_collection)
     if internal_loan:
         if internal_loan['contract_status'] != 'FULLY_PAID':
             inc = {
@@ -302,7 +388,8 @@ def compare_internal_liquidated(loan: Dict, loans_collection, daily_summary: Dic
     
     return current_inconsistencies
 
-def compare_stock_liquidated(loan: Dict, stock_collection, daily_summary: Dict, date_str: str) -> List[Dict]:
+def compare_stock_liquidated(loan: Dict, stock_collection, daily_summary: Dict, date_str: str,
+                             stock_index: KeyIndex = None, stock_keys: set = None) -> List[Dict]:
     """Verifica inconsistências entre base liquidada e estoque"""
     current_inconsistencies = []
     
@@ -310,8 +397,14 @@ def compare_stock_liquidated(loan: Dict, stock_collection, daily_summary: Dict,
     if not ccb_number:
         return []
         
-    # Verificar no estoque
-    stock_loan = get_stock_loan(ccb_number, stock_collection)
+    # Verificar no estoque (pelo índice em memória ou pelas chaves já buscadas, quando disponíveis)
+    keys = loan_keys(loan)
+    if stock_keys is not None:
+        stock_loan = any(key in stock_keys for key in keys)
+    elif stock_index is not None:
+        stock_loan = bool(stock_index.contains_many(keys).any())
+    else:
+        stock_loan = get_stock_loan(keys, stock_collection)
     if stock_loan:
         inc = {
             'tipo': 'Conflito Estoque/Liquidação',
@@ -326,119 +419,422 @@ def compare_stock_liquidated(loan: Dict, stock_collection, daily_summary: Dict,
     
     return current_inconsistencies
 
+def new_reconciliation_state() -> Dict:
+    """Estado de uma execução: sumários por dia e lotes pendentes de gravação"""
+    return {
+        'daily_summary_internal': SpillableDailySummary(
+            memory_budget_bytes(0.1), SPILL_DIR / f"summary_internal_{os.getpid()}.sqlite"
+        ),
+        'daily_summary_stock': SpillableDailySummary(
+            memory_budget_bytes(0.1), SPILL_DIR / f"summary_stock_{os.getpid()}.sqlite"
+        ),
+        'current_batch_internal': [],
+        'current_batch_stock': [],
+        'current_date': None,
+        'total_processed': 0
+    }
+
+def close_reconciliation_state(state: Dict):
+    """Remove os arquivos temporários dos sumários (também quando a execução falha)"""
+    for summary in [state['daily_summary_internal'], state['daily_summary_stock']]:
+        summary.close()
+
+def flush_reconciliation_batches(state: Dict, store: ResultsStore):
+    """Grava os lotes pendentes do dia corrente"""
+    if state['current_batch_internal'] and state['current_date']:
+        save_inconsistencies_batch(state['current_batch_internal'], state['current_date'], "internal_inconsistencies", store)
+    if state['current_batch_stock'] and state['current_date']:
+        save_inconsistencies_batch(state['current_batch_stock'], state['current_date'], "stock_inconsistencies", store)
+    state['current_batch_internal'] = []
+    state['current_batch_stock'] = []
+
+def reconcile_loan(loan: Dict, state: Dict, loans, stock, store: ResultsStore,
+                   stock_index: KeyIndex = None, internal_statuses: Dict = None, stock_keys: set = None):
+    """Classifica um empréstimo liquidado e grava os lotes quando o dia muda ou o lote enche"""
+    # Extrair a data do movimento
+    movement_date = loan.get('DATA_MOVIMENTO')
+    if not movement_date:
+        return
+        
+    date_str = movement_date.strftime("%Y%m%d")
+    daily_summary_internal = state['daily_summary_internal']
+    daily_summary_stock = state['daily_summary_stock']
+    
+    # Inicializar contadores para o dia em ambos os sumários (descarregando em disco se preciso)
+    for summary in [daily_summary_internal, daily_summary_stock]:
+        summary.start_day(date_str)
+    
+    # Verificar inconsistências com base interna
+    internal_inconsistencies = compare_internal_liquidated(
+        loan, loans, daily_summary_internal, date_str, internal_statuses
+    )
+    
+    # Verificar inconsistências com estoque
+    stock_inconsistencies = compare_stock_liquidated(
+        loan, stock, daily_summary_stock, date_str, stock_index, stock_keys
+    )
+    
+    # Se mudou a data ou algum dos lotes está cheio, salva os lotes atuais
+    batch_full = max(len(state['current_batch_internal']), len(state['current_batch_stock'])) >= BATCH_SIZE
+    if state['current_date'] != date_str or batch_full:
+        flush_reconciliation_batches(state, store)
+        state['current_date'] = date_str
+    
+    # Adiciona inconsistências aos lotes atuais
+    state['current_batch_internal'].extend(internal_inconsistencies)
+    state['current_batch_stock'].extend(stock_inconsistencies)
+    
+    state['total_processed'] += 1
+    if state['total_processed'] % 500 == 0:
+        print(f"Processados {state['total_processed']} empréstimos...")
+        # Limpa os caches periodicamente
+        get_internal_loan.cache_clear()
+        get_stock_loan.cache_clear()
+
+def chunk_keys(chunk: List[Dict]) -> List[str]:
+    """Chaves tipadas distintas de um lote de empréstimos liquidados"""
+    return sorted({key for loan in chunk for key in loan_keys(loan)})
+
+def fetch_internal_statuses(loans, keys: List[str]) -> Dict:
+    """Busca o status interno de um lote de chaves com uma única consulta $in coberta pelo índice"""
+    statuses = {}
+    cursor = loans.find(
+        {INTERNAL_KEY_FIELD: {"$in": document_keys_only(keys)}}, INTERNAL_LOAN_PROJECTION
+    ).hint(INTERNAL_STATUS_INDEX)
+    for doc in cursor:
+        statuses.setdefault(doc[INTERNAL_KEY_FIELD], doc['contract_status'])
+    return statuses
+
+def fetch_stock_keys(stock, keys: List[str]) -> set:
+    """Busca quais chaves de um lote existem no estoque com uma única consulta $in"""
+    found = set()
+    cursor = stock.find({RECONCILIATION_KEYS_FIELD: {"$in": keys}}, {"_id": 0, RECONCILIATION_KEYS_FIELD: 1})
+    for doc in cursor:
+        found.update(doc.get(RECONCILIATION_KEYS_FIELD) or [])
+    return found
+
+def stock_keys_from_index(stock_index: KeyIndex, keys: List[str]) -> set:
+    """Consulta vetorizada do lote inteiro no índice de estoque em memória"""
+    found = stock_index.contains_many(keys)
+    return {key for key, exists in zip(keys, found) if exists}
+
+def reconcile_chunk(chunk: List[Dict], state: Dict, loans, stock, store: ResultsStore,
+                    stock_index: KeyIndex = None):
+    """Classifica um lote do cursor com uma consulta $in na base interna e uma no estoque"""
+    keys = chunk_keys(chunk)
+    internal_statuses = fetch_internal_statuses(loans, keys)
+    if stock_index is not None:
+        stock_keys = stock_keys_from_index(stock_index, keys)
+    else:
+        stock_keys = fetch_stock_keys(stock, keys)
+    for loan in chunk:
+        reconcile_loan(loan, state, loans, stock, store, stock_index, internal_statuses, stock_keys)
+
+def prepare_reconciliation(client: MongoClient):
+    """Índices, índice de estoque, SQLite e totais usados pelos dois modos de conciliação"""
+    loans = client['open']['loans']
+    settled = client['investment_funds']['liquidated']
+    stock = client['investment_funds']['stock']
+    
+    # Garante os índices do spec (só cria os que faltarem, ex: fase de indexação não executada)
+    for item in apply_indexes(client):
+        if item['created']:
+            print(f"{item['collection']}: {item['created']} índices criados em {item['seconds']:.2f}s")
+    
+    # Índice de pertinência do estoque, montado uma vez por execução
+    key_budget = memory_budget_bytes(0.5)
+    stock_index = load_or_build(
+        stock, RECONCILIATION_KEYS_FIELD, STOCK_KEY_INDEX_PATH,
+        max_keys_in_memory=key_budget // STOCK_KEY_BYTES if key_budget else None
+    )
+    print(f"Índice de estoque com {len(stock_index):,} chaves")
+    
+    # Resultados da execução anterior são substituídos no SQLite
+    store = ResultsStore()
+    store.reset()
+    
+    # Contar total de registros em cada base
+    total_loans = {
+        'open': loans.count_documents({}),
+        'settled': settled.count_documents({}),
+        'stock': stock.count_documents({})
+    }
+    return stock_index, store, total_loans
+
+def finish_reconciliation(state: Dict, total_loans: Dict) -> str:
+    """Gera os relatórios gerais e o relatório final combinado"""
+    print(f"Total de {state['total_processed']} empréstimos processados")
+    
+    # Gerar relatórios separados para cada tipo de comparação
+    general_report_internal = save_general_report(state['daily_summary_internal'], total_loans, "internal")
+    general_report_stock = save_general_report(state['daily_summary_stock'], total_loans, "stock")
+    
+    for summary in [state['daily_summary_internal'], state['daily_summary_stock']]:
+        if summary.spills:
+            print(f"Sumário diário descarregado em disco {summary.spills} vezes")
+    
+    # Gerar relatório final combinado
+    final_report = "Relatório de Inconsistências:\n\n"
+    final_report += "=== Inconsistências com Base Interna ===\n"
+    final_report += general_report_internal
+    final_report += "\n\n=== Inconsistências com Base de Estoque ===\n"
+    final_report += general_report_stock
+    return final_report
+
 def compare_databases() -> str:
     """Compara os dados entre os bancos para encontrar inconsistências, agrupando por dia"""
+    if RECONCILIATION_MODE == 'async':
+        return compare_databases_async()
     try:
         client = MongoClient('mongodb://localhost:27017/')
         
-        # Conectar aos bancos
-        db_open = client['open']
-        db_investment = client['investment_funds']
-        
         # Collections
-        loans = db_open['loans']
-        settled = db_investment['liquidated']
-        stock = db_investment['stock']
+        loans = client['open']['loans']
+        settled = client['investment_funds']['liquidated']
+        stock = client['investment_funds']['stock']
         
-        # Criar índices para otimizar as consultas
-        loans.create_index([("ccb_number", ASCENDING)])
-        settled.create_index([("DOCUMENTO", ASCENDING)])
-        stock.create_index([("NU_DOCUMENTO", ASCENDING)])
+        stock_index, store, total_loans = prepare_reconciliation(client)
+        state = new_reconciliation_state()
         
-        # Contar total de registros em cada base
-        total_loans = {
-            'open': loans.count_documents({}),
-            'settled': settled.count_documents({}),
-            'stock': stock.count_documents({})
-        }
-        
-        # Dicionários para contagem de inconsistências por dia
-        daily_summary_internal = {}
-        daily_summary_stock = {}
-        
-        # Processar em lotes menores
-        cursor = settled.find(no_cursor_timeout=True).batch_size(BATCH_SIZE)
-        total_processed = 0
-        current_batch_internal = []
-        current_batch_stock = []
-        current_date = None
-        
-        print("Processando empréstimos liquidados...")
-        for loan in cursor:
-            # Extrair a data do movimento
-            movement_date = loan.get('DATA_MOVIMENTO')
-            if not movement_date:
-                continue
-                
-            date_str = movement_date.strftime("%Y%m%d")
-            
-            # Inicializar contadores para o dia em ambos os sumários
-            for summary in [daily_summary_internal, daily_summary_stock]:
-                if date_str not in summary:
-                    summary[date_str] = {
-                        'total': 0,
-                        'by_type': {}
-                    }
-            
-            # Verificar inconsistências com base interna
-            internal_inconsistencies = compare_internal_liquidated(
-                loan, loans, daily_summary_internal, date_str
-            )
+        try:
+            # Processar em lotes menores
+            cursor = settled.find({}, LIQUIDATED_PROJECTION, no_cursor_timeout=True).batch_size(BATCH_SIZE)
             
-            # Verificar inconsistências com estoque
-            stock_inconsistencies = compare_stock_liquidated(
-                loan, stock, daily_summary_stock, date_str
-            )
+            print("Processando empréstimos liquidados...")
+            chunk = []
+            for loan in cursor:
+                chunk.append(loan)
+                if len(chunk) >= LOOKUP_BATCH_SIZE:
+                    reconcile_chunk(chunk, state, loans, stock, store, stock_index)
+                    chunk = []
+            if chunk:
+                reconcile_chunk(chunk, state, loans, stock, store, stock_index)
             
-            # Se mudou a data ou o lote está cheio, salva os lotes atuais
-            if current_date != date_str or len(current_batch_internal) >= BATCH_SIZE:
-                if current_batch_internal:
-                    save_inconsistencies_batch(current_batch_internal, current_date, "internal_inconsistencies")
-                if current_batch_stock:
-                    save_inconsistencies_batch(current_batch_stock, current_date, "stock_inconsistencies")
-                current_batch_internal = []
-                current_batch_stock = []
-                current_date = date_str
+            # Salva os últimos lotes se houver
+            flush_reconciliation_batches(state, store)
             
-            # Adiciona inconsistências aos lotes atuais
-            current_batch_internal.extend(internal_inconsistencies)
-            current_batch_stock.extend(stock_inconsistencies)
+            # Fechar cursor
+            cursor.close()
+            store.close()
             
-            total_processed += 1
-            if total_processed % 500 == 0:
-                print(f"Processados {total_processed} empréstimos...")
-                # Limpa os caches periodicamente
-                get_internal_loan.cache_clear()
-                get_stock_loan.cache_clear()
-        
-        # Salva os últimos lotes se houver
-        if current_batch_internal and current_date:
-            save_inconsistencies_batch(current_batch_internal, current_date, "internal_inconsistencies")
-        if current_batch_stock and current_date:
-            save_inconsistencies_batch(current_batch_stock, current_date, "stock_inconsistencies")
-        
-        print(f"Total de {total_processed} empréstimos processados")
-        
-        # Fechar cursor
-        cursor.close()
+            final_report = finish_reconciliation(state, total_loans)
+            client.close()
+            return final_report
+        finally:
+            close_reconciliation_state(state)
         
-        # Gerar relatórios separados para cada tipo de comparação
-        general_report_internal = save_general_report(daily_summary_internal, total_loans, "internal")
-        general_report_stock = save_general_report(daily_summary_stock, total_loans, "stock")
+    except Exception as e:
+        return f"Erro ao comparar bancos de dados: {str(e)}"
+
+# Conciliação assíncrona
+async def fetch_internal_statuses_async(loans, keys: List[str]) -> Dict:
+    """Busca o status interno de um lote de chaves com uma única consulta $in coberta pelo índice"""
+    statuses = {}
+    cursor = loans.find(
+        {INTERNAL_KEY_FIELD: {"$in": document_keys_only(keys)}}, INTERNAL_LOAN_PROJECTION
+    ).hint(INTERNAL_STATUS_INDEX)
+    async for doc in cursor:
+        statuses.setdefault(doc[INTERNAL_KEY_FIELD], doc['contract_status'])
+    return statuses
+
+async def fetch_stock_keys_async(stock, keys: List[str]) -> set:
+    """Busca quais chaves de um lote existem no estoque com uma única consulta $in"""
+    found = set()
+    cursor = stock.find({RECONCILIATION_KEYS_FIELD: {"$in": keys}}, {"_id": 0, RECONCILIATION_KEYS_FIELD: 1})
+    async for doc in cursor:
+        found.update(doc.get(RECONCILIATION_KEYS_FIELD) or [])
+    return found
+
+async def _compare_databases_async(stock_index: KeyIndex, store: ResultsStore, total_loans: Dict) -> str:
+    """Pipeline assíncrono: leitura do cursor, buscas $in concorrentes e gravação em ordem"""
+    client = AsyncIOMotorClient('mongodb://localhost:27017/')
+    loans = client['open']['loans']
+    settled = client['investment_funds']['liquidated']
+    stock = client['investment_funds']['stock']
+    
+    semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    state = new_reconciliation_state()
+    
+    async def lookup(chunk: List[Dict]):
+        keys = chunk_keys(chunk)
+        async with semaphore:
+            if stock_index is not None:
+                statuses = await fetch_internal_statuses_async(loans, keys)
+                return chunk, statuses, stock_keys_from_index(stock_index, keys)
+            statuses, stock_keys = await asyncio.gather(
+                fetch_internal_statuses_async(loans, keys),
+                fetch_stock_keys_async(stock, keys)
+            )
+            return chunk, statuses, stock_keys
+    
+    def classify(chunk: List[Dict], statuses: Dict, stock_keys: set):
+        for loan in chunk:
+            reconcile_loan(loan, state, loans, stock, store, stock_index, statuses, stock_keys)
+    
+    # Lotes são classificados na ordem do cursor, preservando a ordem dos arquivos por dia.
+    # A classificação (e a gravação dos arquivos) roda em thread, sobrepondo-se às buscas.
+    pending = deque()
+    
+    async def drain(limit: int):
+        while len(pending) > limit:
+            chunk, statuses, stock_keys = await pending.popleft()
+            await asyncio.to_thread(classify, chunk, statuses, stock_keys)
+    
+    try:
+        print("Processando empréstimos liquidados (modo assíncrono)...")
+        cursor = settled.find({}, LIQUIDATED_PROJECTION).batch_size(BATCH_SIZE)
+        chunk = []
+        async for loan in cursor:
+            chunk.append(loan)
+            if len(chunk) >= LOOKUP_BATCH_SIZE:
+                pending.append(asyncio.ensure_future(lookup(chunk)))
+                chunk = []
+                await drain(ASYNC_MAX_CONCURRENCY * 2)
+        if chunk:
+            pending.append(asyncio.ensure_future(lookup(chunk)))
+        await drain(0)
         
-        # Gerar relatório final combinado
-        final_report = "Relatório de Inconsistências:\n\n"
-        final_report += "=== Inconsistências com Base Interna ===\n"
-        final_report += general_report_internal
-        final_report += "\n\n=== Inconsistências com Base de Estoque ===\n"
-        final_report += general_report_stock
+        # Salva os últimos lotes se houver
+        await asyncio.to_thread(flush_reconciliation_batches, state, store)
         
+        return finish_reconciliation(state, total_loans)
+    finally:
+        for future in pending:
+            future.cancel()
+        close_reconciliation_state(state)
+        client.close()
+
+def compare_databases_async() -> str:
+    """Compara os bancos usando o driver assíncrono (Motor) e buscas em lote concorrentes"""
+    if AsyncIOMotorClient is None:
+        return "Erro ao comparar bancos de dados: modo assíncrono requer o pacote motor"
+    try:
+        client = MongoClient('mongodb://localhost:27017/')
+        stock_index, store, total_loans = prepare_reconciliation(client)
         client.close()
-        return final_report
+        
+        try:
+            return asyncio.run(_compare_databases_async(stock_index, store, total_loans))
+        finally:
+            store.close()
         
     except Exception as e:
         return f"Erro ao comparar bancos de dados: {str(e)}"
 
+def query_results(filters: str = "") -> str:
+    """Consulta inconsistências específicas no SQLite de resultados"""
+    try:
+        params = json.loads(filters) if filters and filters.strip() else {}
+        if not isinstance(params, dict):
+            return "Erro ao consultar inconsistências: os filtros devem ser um objeto JSON"
+        allowed = {'documento', 'tipo', 'data_inicio', 'data_fim', 'comparacao', 'page', 'page_size'}
+        unknown = set(params) - allowed
+        if unknown:
+            return f"Erro ao consultar inconsistências: filtros desconhecidos {sorted(unknown)}"
+        result = query_inconsistencies(**params)
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    except Exception as e:
+        return f"Erro ao consultar inconsistências: {str(e)}"
+
+# Memoização das ferramentas
+def files_fingerprint(paths: List[Path]) -> List:
+    """Tamanho e data de modificação dos arquivos de entrada"""
+    return [
+        [str(path), path.stat().st_size, path.stat().st_mtime] if path.exists() else [str(path), None, None]
+        for path in paths
+    ]
+
+def mongo_fingerprint(*collections) -> Dict:
+    """Impressão digital das collections indicadas como (banco, collection)"""
+    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
+    try:
+        return {
+            f"{db_name}.{coll_name}": collection_fingerprint(client[db_name][coll_name])
+            for db_name, coll_name in collections
+        }
+    finally:
+        client.close()
+
+def loader_fingerprint(source: str, db_name: str, coll_name: str):
+    """Uma carga só precisa rodar de novo se os CSVs ou a collection mudaram"""
+    def fingerprint() -> Dict:
+        return {
+            'files': files_fingerprint(DATA_FILES[source]),
+            'mongo': mongo_fingerprint((db_name, coll_name))
+        }
+    return fingerprint
+
+def reconciliation_fingerprint() -> Dict:
+    """A conciliação depende das três collections e dos relatórios já gerados"""
+    return {
+        'mongo': mongo_fingerprint(('open', 'loans'), ('investment_funds', 'liquidated'), ('investment_funds', 'stock')),
+        'reports': files_fingerprint([
+            RESULTS_DIR / 'internal_inconsistencies' / 'general_report.txt',
+            RESULTS_DIR / 'stock_inconsistencies' / 'general_report.txt'
+        ])
+    }
+
+def summarize_report(output: str) -> str:
+    """Mantém do relatório de conciliação apenas os cabeçalhos e os totais por tipo"""
+    lines = []
+    in_totals = False
+    for line in output.splitlines():
+        if line.startswith('=== ') or line == 'Total de Inconsistências por Tipo:':
+            lines.append(line)
+            in_totals = not line.startswith('=== ')
+        elif in_totals and line.startswith('- '):
+            lines.append(line)
+        else:
+            in_totals = False
+    lines.append('Use a ferramenta "Consultar inconsistências" para detalhes por documento, tipo ou data.')
+    return "\n".join(lines)
+
+def compact_tool_output(name: str, output: str, summarize=None) -> str:
+    """Saídas longas são gravadas em disco e voltam ao LLM como resumo + caminho do arquivo"""
+    lines = output.splitlines()
+    if len(lines) <= TOOL_SUMMARY_LINES:
+        return output
+    TOOL_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    readable = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    filepath = TOOL_OUTPUT_DIR / f"{re.sub(r'[^0-9a-z]+', '_', readable).strip('_')}.txt"
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(output)
+    summary = summarize(output) if summarize else "\n".join(lines[:TOOL_SUMMARY_LINES])
+    return f"{summary}\n\nRelatório completo: {filepath}"
+
+def cache_key(name: str) -> str:
+    """Nome do arquivo de cache de uma chamada: hash SHA1 (12 caracteres) do nome da ferramenta + argumentos"""
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()[:12]
+
+def memoized_tool(name: str, func, fingerprint, summarize=None):
+    """Envolve a função de uma ferramenta: repete o resultado enquanto a impressão digital
+    dos dados não mudar e devolve saídas longas de forma compacta"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        args_key = json.dumps([args, kwargs], sort_keys=True, default=str)
+        cache_path = TOOL_CACHE_DIR / f"{cache_key(name + args_key)}.json"
+        try:
+            current = fingerprint()
+        except Exception as e:
+            print(f"Cache da ferramenta '{name}' indisponível: {str(e)}")
+            current = None
+
+        if current is not None and cache_path.exists():
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['fingerprint'] == json.loads(json.dumps(current, default=str)):
+                return f"(resultado reaproveitado, dados inalterados)\n{cached['output']}"
+
+        output = compact_tool_output(name, func(*args, **kwargs), summarize)
+
+        # Só guarda execuções bem-sucedidas, com a impressão digital dos dados após a execução
+        if current is not None and not output.startswith('Erro'):
+            TOOL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fingerprint(), 'output': output}, f, ensure_ascii=False, default=str)
+        return output
+    return wrapper
+
 # Função principal
 def main():
     try:
@@ -449,42 +845,74 @@ def main():
             print("Não foi possível iniciar o MongoDB. Encerrando...")
             return
 
-        # Criando as ferramentas para processamento
-        processing_tools = [
+        # Criando as ferramentas de carga (uma por fonte)
+        loading_tools = [
             Tool(
                 name="Processar dados internos",
-                func=process_internal_data,
+                func=memoized_tool(
+                    "Processar dados internos", process_internal_data,
+                    loader_fingerprint('internal', 'open', 'loans')
+                ),
                 description="Processa os dados internos do sistema"
             ),
             Tool(
                 name="Processar dados liquidados",
-                func=process_liquidated_data,
+                func=memoized_tool(
+                    "Processar dados liquidados", process_liquidated_data,
+                    loader_fingerprint('liquidated', 'investment_funds', 'liquidated')
+                ),
                 description="Processa os dados de empréstimos liquidados"
             ),
             Tool(
                 name="Processar dados de estoque",
-                func=process_stock_data,
+                func=memoized_tool(
+                    "Processar dados de estoque", process_stock_data,
+                    loader_fingerprint('stock', 'investment_funds', 'stock')
+                ),
                 description="Processa os dados de estoque atual"
             )
         ]
+        index_tool = Tool(
+            name="Criar índices",
+            func=build_indexes,
+            description="Cria os índices de todas as collections; executar após todas as cargas"
+        )
         
         # Criando a ferramenta de análise
         analysis_tools = [
             Tool(
                 name="Comparar bancos",
-                func=compare_databases,
+                func=memoized_tool(
+                    "Comparar bancos", compare_databases,
+                    reconciliation_fingerprint, summarize_report
+                ),
                 description="Compara os dados entre os bancos para encontrar inconsistências"
+            ),
+            Tool(
+                name="Consultar inconsistências",
+                func=query_results,
+                description=(
+                    "Consulta paginada das inconsistências já encontradas. Recebe um JSON com os filtros "
+                    "opcionais documento, tipo, data_inicio, data_fim (YYYY-MM-DD), comparacao "
+                    "(internal_inconsistencies ou stock_inconsistencies), page e page_size"
+                )
             )
         ]
         
-        # Criando o agente de processamento de dados
-        data_engineer = Agent(
-            role="Engenheiro de Dados",
-            goal="Processar e integrar todos os dados no MongoDB com eficiência e precisão",
-            backstory="Especialista em engenharia de dados com foco em processamento ETL e integração com MongoDB",
-            tools=processing_tools,
-            verbose=True
-        )
+        # Criando os agentes de processamento de dados
+        # As cargas assíncronas rodam em threads separadas e o Agent do crewai 0.19 não é
+        # thread-safe, então cada carga tem o seu próprio agente, só com a sua ferramenta
+        def new_data_engineer(tools: List[Tool]) -> Agent:
+            return Agent(
+                role="Engenheiro de Dados",
+                goal="Processar e integrar todos os dados no MongoDB com eficiência e precisão",
+                backstory="Especialista em engenharia de dados com foco em processamento ETL e integração com MongoDB",
+                tools=tools,
+                verbose=True
+            )
+
+        loading_engineers = [new_data_engineer([tool]) for tool in loading_tools]
+        data_engineer = new_data_engineer([index_tool])
 
         # Criando o agente analisador de dados
         quality_analyst = Agent(
@@ -496,21 +924,33 @@ def main():
         )
 
         # Criar as tarefas
-        tasks = [
+        # As três cargas são independentes e rodam em paralelo; a indexação espera por todas
+        loading_tasks = [
             Task(
                 description="Processar dados internos do sistema",
                 expected_output="Dados internos processados e armazenados no MongoDB",
-                agent=data_engineer
+                agent=loading_engineers[0],
+                async_execution=True
             ),
             Task(
                 description="Processar dados de empréstimos liquidados",
                 expected_output="Dados de liquidação processados e armazenados no MongoDB",
-                agent=data_engineer
+                agent=loading_engineers[1],
+                async_execution=True
             ),
             Task(
                 description="Processar dados de estoque atual",
                 expected_output="Dados de estoque processados e armazenados no MongoDB",
-                agent=data_engineer
+                agent=loading_engineers[2],
+                async_execution=True
+            )
+        ]
+        tasks = loading_tasks + [
+            Task(
+                description="Criar os índices das collections após todas as cargas",
+                expected_output="Índices criados e tempo de criação por collection",
+                agent=data_engineer,
+                context=loading_tasks
             ),
             Task(
                 description="Analisar inconsistências entre as bases de dados",
@@ -521,7 +961,7 @@ def main():
         
         # Criar a equipe
         crew = Crew(
-            agents=[data_engineer, quality_analyst],
+            agents=loading_engineers + [data_engineer, quality_analyst],
             tasks=tasks,
             verbose=True
         )
@@ -0,0 +1,158 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'analise_de_dados'))
+
+import archive  # noqa: E402
+from archive import compact_results, iter_archived  # noqa: E402
+
+COMPARISON = 'internal_inconsistencies'
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    results_dir = tmp_path / 'results'
+    (results_dir / COMPARISON).mkdir(parents=True)
+    return results_dir, tmp_path / 'archive'
+
+
+def write_day(results_dir, date, documentos):
+    path = results_dir / COMPARISON / f"inconsistencies_{date}.json"
+    movement = f"{date[:4]}-{date[4:6]}-{date[6:]}T00:00:00"
+    path.write_text(json.dumps([
+        {'tipo': 'Não Encontrado', 'documento': doc, 'data_movimento': movement} for doc in documentos
+    ]), encoding='utf-8')
+    return path
+
+
+def compact(dirs, **kwargs):
+    results_dir, archive_dir = dirs
+    return compact_results(results_dir, archive_dir, keep_days=1, **kwargs)
+
+
+def archived(dirs):
+    return sorted(record['documento'] for record in iter_archived(COMPARISON, archive_dir=dirs[1]))
+
+
+def test_append_days_and_remove_sources(dirs):
+    first = write_day(dirs[0], '20240301', ['1'])
+    second = write_day(dirs[0], '20240302', ['2', '3'])
+
+    stats = compact(dirs)
+
+    assert stats['files'] == 2 and stats['records'] == 3
+    assert archived(dirs) == ['1', '2', '3']
+    assert not first.exists() and not second.exists()
+    # Nada novo: segunda execução não anexa de novo
+    assert compact(dirs)['files'] == 0
+    assert archived(dirs) == ['1', '2', '3']
+
+
+def test_keep_source_then_unchanged_file_is_not_duplicated(dirs):
+    day = write_day(dirs[0], '20240301', ['1'])
+    compact(dirs, remove_source=False)
+    assert day.exists()
+
+    stats = compact(dirs)
+    assert stats['files'] == 0 and stats['replaced'] == 0
+    assert archived(dirs) == ['1']
+    assert not day.exists()
+
+
+def test_changed_day_replaces_archived_records(dirs):
+    write_day(dirs[0], '20240301', ['1'])
+    write_day(dirs[0], '20240302', ['9'])
+    compact(dirs)
+
+    day = write_day(dirs[0], '20240301', ['1', '2'])
+    stats = compact(dirs)
+
+    assert stats['replaced'] == 1
+    assert archived(dirs) == ['1', '2', '9']
+    assert not day.exists()
+
+
+def test_recovers_uncommitted_append(dirs):
+    write_day(dirs[0], '20240301', ['1'])
+    compact(dirs)
+    partition = dirs[1] / COMPARISON / '2024-03.jsonl.gz'
+    # Membro gzip anexado por uma execução interrompida antes de gravar o manifesto
+    archive._append_day(partition, [{'documento': 'lixo', 'data_movimento': '2024-03-05T00:00:00'}])
+
+    write_day(dirs[0], '20240302', ['2'])
+    compact(dirs)
+
+    assert archived(dirs) == ['1', '2']
+
+
+def test_recovers_replace_interrupted_before_swap(dirs, monkeypatch):
+    write_day(dirs[0], '20240301', ['1'])
+    write_day(dirs[0], '20240302', ['9'])
+    compact(dirs)
+    day = write_day(dirs[0], '20240301', ['1', '2'])
+
+    # Interrompe depois de gravar o manifesto com a troca pendente, antes de trocar o arquivo
+    original_replace = Path.replace
+
+    def crash(self, target):
+        if self.name.endswith('.jsonl.gz.tmp'):
+            raise KeyboardInterrupt
+        return original_replace(self, target)
+
+    monkeypatch.setattr(Path, 'replace', crash)
+    with pytest.raises(KeyboardInterrupt):
+        compact(dirs)
+    monkeypatch.setattr(Path, 'replace', original_replace)
+    assert day.exists()
+
+    compact(dirs)
+    assert archived(dirs) == ['1', '2', '9']
+    assert not day.exists()
+
+
+def test_recovers_replace_interrupted_after_swap(dirs, monkeypatch):
+    write_day(dirs[0], '20240301', ['1'])
+    write_day(dirs[0], '20240302', ['9'])
+    compact(dirs)
+    write_day(dirs[0], '20240301', ['1', '2'])
+
+    # Interrompe depois da troca, antes de limpar a pendência no manifesto
+    original_save = archive._save_manifest
+    calls = []
+
+    def crash(type_dir, manifest):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        original_save(type_dir, manifest)
+
+    monkeypatch.setattr(archive, '_save_manifest', crash)
+    with pytest.raises(KeyboardInterrupt):
+        compact(dirs)
+    monkeypatch.setattr(archive, '_save_manifest', original_save)
+
+    compact(dirs)
+    assert archived(dirs) == ['1', '2', '9']
+
+
+def test_discards_replacement_written_before_manifest(dirs, monkeypatch):
+    write_day(dirs[0], '20240301', ['1'])
+    compact(dirs)
+    day = write_day(dirs[0], '20240301', ['1', '2'])
+
+    # Interrompe com o .tmp gravado e o manifesto ainda na versão anterior
+    def crash(type_dir, manifest):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(archive, '_save_manifest', crash)
+    with pytest.raises(KeyboardInterrupt):
+        compact(dirs)
+    monkeypatch.undo()
+    assert archived(dirs) == ['1']
+
+    compact(dirs)
+    assert archived(dirs) == ['1', '2']
+    assert not day.exists()
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import bson
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'processamento_de_dados'))
+
+from bulk_writer import iter_records  # noqa: E402
+
+
+def test_iter_records_replaces_missing_values_with_none():
+    df = pd.DataFrame({
+        'DOCUMENTO': ['1', None, '3'],
+        'DATA_VENCIMENTO': pd.to_datetime(['01/03/2024', '', '03/03/2024'], format='%d/%m/%Y', errors='coerce'),
+        'VALOR': [1.5, np.nan, 3.0],
+        'FUNDO': pd.Categorical(['A', None, 'B']),
+    })
+
+    records = list(iter_records(df, chunk_size=2))
+
+    assert len(records) == 3
+    assert records[1] == {'DOCUMENTO': None, 'DATA_VENCIMENTO': None, 'VALOR': None, 'FUNDO': None}
+    assert records[0]['DATA_VENCIMENTO'] == pd.Timestamp('2024-03-01')
+    # Todos os registros precisam ser serializáveis em BSON (NaT quebrava a carga)
+    for record in records:
+        bson.encode(record)
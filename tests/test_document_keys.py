@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'processamento_de_dados'))
+
+from document_keys import (  # noqa: E402
+    document_key,
+    document_keys_only,
+    normalize_document,
+    reconciliation_keys,
+)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('123', '123'),
+    ('000123', '123'),
+    ('12.345.678-9', '123456789'),
+    (' ab-12/c ', 'AB12C'),
+    ('000', '0'),
+    (123, '123'),
+    (123.0, '123'),
+    (1e15, '1000000000000000'),
+])
+def test_normalize_document(value, expected):
+    assert normalize_document(value) == expected
+
+
+@pytest.mark.parametrize('value', [None, '', '  ', '-./', float('nan')])
+def test_normalize_document_empty(value):
+    assert normalize_document(value) is None
+
+
+def test_normalize_document_strings_are_not_read_as_floats():
+    # Só floats de verdade perdem a parte decimal; em texto o ponto é pontuação
+    assert normalize_document('10.000') == '10000'
+    assert normalize_document('10.001') == '10001'
+    assert normalize_document('123.0') == '1230'
+
+
+def test_normalize_document_fractional_float_keeps_digits():
+    assert normalize_document(10.5) == '105'
+
+
+def test_reconciliation_keys_are_typed():
+    assert reconciliation_keys('00123', '123') == ['DOC:123', 'SN:123']
+    assert reconciliation_keys(None, '456') == ['SN:456']
+    assert reconciliation_keys('789') == ['DOC:789']
+    assert reconciliation_keys(None, None) == []
+
+
+def test_keys_only_match_same_type():
+    liquidated = set(reconciliation_keys('999', '123'))
+    stock = set(reconciliation_keys('123', '555'))
+    # Mesmo número, tipos diferentes: não é o mesmo empréstimo
+    assert not liquidated & stock
+    assert set(reconciliation_keys('1', '123')) & set(reconciliation_keys('2', '0123')) == {'SN:123'}
+
+
+def test_document_keys_only():
+    keys = reconciliation_keys('123', '456')
+    assert document_keys_only(keys) == ['DOC:123']
+    assert document_key('0123') in document_keys_only(keys)
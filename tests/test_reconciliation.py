@@ -0,0 +1,160 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('crewai')
+pytest.importorskip('langchain')
+mongomock = pytest.importorskip('mongomock')
+mongomock_motor = pytest.importorskip('mongomock_motor')
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+from key_index import KeyIndex  # noqa: E402
+from results_store import ResultsStore  # noqa: E402
+
+# (DOCUMENTO, SEU_NUMERO, dia): os dias atravessam as fronteiras de lote de todos os tamanhos testados
+SETTLED = [
+    ('1', None, 1), ('2', '20', 1), ('3', '30', 1),
+    ('4', None, 2), ('5', '1', 2), ('6', None, 2), ('7', '70', 2), ('8', None, 2),
+    ('9', '90', 3), ('10', None, 3),
+    ('11', '30', 4), ('12', None, 4), ('2', None, 4),
+]
+INTERNAL = {'1': 'FULLY_PAID', '2': 'ACTIVE', '3': 'FULLY_PAID', '4': 'LATE', '6': 'FULLY_PAID',
+            '7': 'ACTIVE', '9': 'FULLY_PAID', '11': 'ACTIVE', '12': 'FULLY_PAID'}
+# (NU_DOCUMENTO, SEU_NUMERO): o SN:30 do estoque casa com o SEU_NUMERO dos liquidados 3 e 11;
+# o NU_DOCUMENTO 5 não casa com o SEU_NUMERO 5 de ninguém
+STOCK = [('2', None), ('X', '30'), ('7', None), ('Y', '5'), ('Z', None)]
+
+
+@pytest.fixture
+def databases(monkeypatch):
+    client = mongomock.MongoClient()
+    client['open']['loans'].insert_many([
+        {'ccb_number': doc, main.INTERNAL_KEY_FIELD: f"DOC:{doc}", 'contract_status': status}
+        for doc, status in INTERNAL.items()
+    ])
+    client['investment_funds']['stock'].insert_many([
+        {'NU_DOCUMENTO': doc, main.RECONCILIATION_KEYS_FIELD: main.reconciliation_keys(doc, numero)}
+        for doc, numero in STOCK
+    ])
+    client['investment_funds']['liquidated'].insert_many([
+        {'DOCUMENTO': doc, 'DATA_MOVIMENTO': datetime(2024, 3, day),
+         main.RECONCILIATION_KEYS_FIELD: main.reconciliation_keys(doc, numero)}
+        for doc, numero, day in SETTLED
+    ])
+
+    # O find_one do mongomock não aceita hint (o caminho por empréstimo usa hint no find_one)
+    find_one = mongomock.collection.Collection.find_one
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one',
+                        lambda self, filter=None, projection=None, **kwargs: find_one(self, filter, projection))
+    # Lotes de gravação pequenos para os dias serem gravados em vários flushes
+    monkeypatch.setattr(main, 'BATCH_SIZE', 2)
+    main.get_internal_loan.cache_clear()
+    main.get_stock_loan.cache_clear()
+    return client
+
+
+def collections(client):
+    return client['open']['loans'], client['investment_funds']['liquidated'], client['investment_funds']['stock']
+
+
+def totals(client):
+    loans, settled, stock = collections(client)
+    return {'open': loans.count_documents({}), 'settled': settled.count_documents({}),
+            'stock': stock.count_documents({})}
+
+
+def use_results_dir(monkeypatch, results_dir):
+    results_dir.mkdir()
+    monkeypatch.setattr(main, 'RESULTS_DIR', results_dir)
+    monkeypatch.setattr(main, 'SPILL_DIR', results_dir / '.spill')
+    return ResultsStore(results_dir / 'inconsistencies.sqlite')
+
+
+def collect(results_dir):
+    """Arquivos por dia, relatórios gerais e linhas do SQLite de uma execução"""
+    outputs = {
+        str(path.relative_to(results_dir)): json.loads(path.read_text(encoding='utf-8'))
+        for path in sorted(results_dir.rglob('*.json'))
+    }
+    store = ResultsStore(results_dir / 'inconsistencies.sqlite')
+    outputs['sqlite'] = store.query(page_size=1000)['items']
+    store.close()
+    return outputs
+
+
+def run_sync(client, monkeypatch, results_dir, process):
+    loans, settled, stock = collections(client)
+    store = use_results_dir(monkeypatch, results_dir)
+    state = main.new_reconciliation_state()
+    try:
+        process(list(settled.find({}, main.LIQUIDATED_PROJECTION)), state, loans, stock, store)
+        main.flush_reconciliation_batches(state, store)
+        main.finish_reconciliation(state, totals(client))
+    finally:
+        main.close_reconciliation_state(state)
+        store.close()
+    return collect(results_dir)
+
+
+def per_loan(settled, state, loans, stock, store):
+    for loan in settled:
+        main.reconcile_loan(loan, state, loans, stock, store)
+
+
+def chunked(size, stock_index=None):
+    def process(settled, state, loans, stock, store):
+        for start in range(0, len(settled), size):
+            main.reconcile_chunk(settled[start:start + size], state, loans, stock, store, stock_index)
+    return process
+
+
+def test_chunked_and_async_match_per_loan(databases, monkeypatch, tmp_path):
+    client = databases
+    stock = client['investment_funds']['stock']
+    expected = run_sync(client, monkeypatch, tmp_path / 'per_loan', per_loan)
+
+    # Sanidade do cenário: SEU_NUMERO só casa com SEU_NUMERO, documento só com documento
+    internal_types = {
+        item['documento']: item['tipo'] for item in expected['sqlite']
+        if item['comparacao'] == 'internal_inconsistencies'
+    }
+    assert internal_types['5'] == 'Não Encontrado'
+    conflicts = sorted(
+        item['documento'] for item in expected['sqlite'] if item['comparacao'] == 'stock_inconsistencies'
+    )
+    assert conflicts == ['11', '2', '2', '3', '7']
+    assert 'internal_inconsistencies/inconsistencies_20240302.json' in expected
+
+    stock_index = KeyIndex.from_collection(stock, main.RECONCILIATION_KEYS_FIELD)
+    external_index = KeyIndex.from_collection_external(
+        stock, main.RECONCILIATION_KEYS_FIELD, tmp_path / 'stock_keys.npy', run_size=2
+    )
+    assert np.array_equal(np.asarray(external_index.keys), stock_index.keys)
+
+    scenarios = {
+        f"chunk_{size}_{label}": chunked(size, index)
+        for size in (1, 3, 5, 100)
+        for label, index in (('mongo', None), ('index', stock_index), ('external', external_index))
+    }
+    for name, process in scenarios.items():
+        assert run_sync(client, monkeypatch, tmp_path / name, process) == expected, name
+
+    # Pipeline assíncrono com lotes de busca desiguais e buscas concorrentes
+    monkeypatch.setattr(main, 'AsyncIOMotorClient',
+                        lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client))
+    monkeypatch.setattr(main, 'LOOKUP_BATCH_SIZE', 4)
+    monkeypatch.setattr(main, 'ASYNC_MAX_CONCURRENCY', 2)
+    for name, index in (('async_mongo', None), ('async_index', stock_index)):
+        store = use_results_dir(monkeypatch, tmp_path / name)
+        try:
+            asyncio.run(main._compare_databases_async(index, store, totals(client)))
+        finally:
+            store.close()
+        assert collect(tmp_path / name) == expected, name
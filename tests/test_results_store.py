@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'analise_de_dados'))
+
+from results_store import ResultsStore  # noqa: E402
+
+
+def test_query_by_document_ignores_formatting(tmp_path):
+    store = ResultsStore(tmp_path / 'inconsistencies.sqlite')
+    store.insert_many([
+        {'tipo': 'Não Encontrado', 'documento': '00123', 'data_movimento': '2024-03-01T00:00:00'},
+        {'tipo': 'Status Inconsistente', 'documento': '456', 'data_movimento': '2024-03-02T00:00:00'},
+    ], 'internal_inconsistencies')
+    store.insert_many([
+        {'tipo': 'Conflito Estoque/Liquidação', 'documento': '1.23', 'data_movimento': '2024-03-03T00:00:00'},
+    ], 'stock_inconsistencies')
+
+    for documento in ['123', '00123', '1-23']:
+        result = store.query(documento=documento)
+        assert result['total'] == 2
+        assert [item['documento'] for item in result['items']] == ['00123', '1.23']
+
+    assert store.query(documento='456', data_inicio='2024-03-03')['total'] == 0
+    store.close()
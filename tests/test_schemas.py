@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'processamento_de_dados'))
+
+from schemas import concat_with_schema, format_dates_iso, read_csv_with_schema  # noqa: E402
+
+HEADER = 'ccb_number,contract_status,installment_status,contract_created_date,installment_paid_date\n'
+
+
+def write_part(tmp_path, name, rows):
+    path = tmp_path / name
+    path.write_text(HEADER + ''.join(f"{row}\n" for row in rows), encoding='utf-8')
+    return path
+
+
+def test_concat_keeps_category_dtype(tmp_path):
+    parts = [
+        read_csv_with_schema(write_part(tmp_path, 'p1.csv', ['001,ACTIVE,OPEN,2024-03-01,']), 'internal'),
+        read_csv_with_schema(write_part(tmp_path, 'p2.csv', ['002,LATE,PAID,2024-04-01,']), 'internal'),
+    ]
+    df = concat_with_schema(parts, 'internal')
+
+    assert isinstance(df['contract_status'].dtype, pd.CategoricalDtype)
+    assert sorted(df['contract_status'].cat.categories) == ['ACTIVE', 'LATE']
+    assert df['contract_status'].tolist() == ['ACTIVE', 'LATE']
+
+
+def test_internal_dates_are_parsed_on_read(tmp_path):
+    path = write_part(tmp_path, 'p.csv', [
+        '001,ACTIVE,OPEN,2024-03-01,2024-03-05T10:20:30',
+        '002,ACTIVE,OPEN,2024-03-02,invalida',
+    ])
+    df = read_csv_with_schema(path, 'internal')
+
+    assert df['installment_paid_date'].dtype == 'datetime64[ns]'
+    assert df['installment_paid_date'][0] == pd.Timestamp('2024-03-05 10:20:30')
+    assert pd.isna(df['installment_paid_date'][1])
+    assert df['contract_created_date'][1] == pd.Timestamp('2024-03-02')
+
+
+def test_internal_dates_keep_precision_and_offset(tmp_path):
+    path = write_part(tmp_path, 'p.csv', [
+        '001,ACTIVE,OPEN,2024-03-01 10:20:30.123456,2024-03-05T10:20:30-03:00',
+        '002,ACTIVE,OPEN,2024-03-02,',
+    ])
+    df = format_dates_iso(read_csv_with_schema(path, 'internal'), 'internal')
+
+    assert df['contract_created_date'].tolist() == ['2024-03-01T10:20:30.123456', '2024-03-02T00:00:00']
+    assert df['installment_paid_date'].tolist() == ['2024-03-05T10:20:30-03:00', None]
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'tools' / 'analise_de_dados'))
+
+from spill import SpillableDailySummary  # noqa: E402
+
+
+def count(summary, date, tipo):
+    summary.start_day(date)
+    summary[date]['total'] += 1
+    summary[date]['by_type'][tipo] = summary[date]['by_type'].get(tipo, 0) + 1
+
+
+def test_in_memory_summary():
+    summary = SpillableDailySummary()
+    count(summary, '20240302', 'A')
+    count(summary, '20240301', 'B')
+
+    assert len(summary) == 2
+    assert '20240301' in summary
+    assert list(summary) == ['20240301', '20240302']
+    assert summary.spills == 0
+
+
+def test_spilled_summary_is_consistent(tmp_path):
+    # Orçamento mínimo: cada novo dia descarrega os anteriores no SQLite
+    summary = SpillableDailySummary(1, tmp_path / 'summary.sqlite')
+    for date, tipo in [('20240301', 'A'), ('20240302', 'A'), ('20240301', 'B'), ('20240303', 'A')]:
+        count(summary, date, tipo)
+
+    assert summary.spills > 0
+    assert len(summary) == 3
+    assert '20240301' in summary
+    assert '20240399' not in summary
+    assert list(summary.keys()) == ['20240301', '20240302', '20240303']
+    assert dict(summary.items())['20240301'] == {'total': 2, 'by_type': {'A': 1, 'B': 1}}
+    assert sum(day['total'] for day in summary.values()) == 4
+
+    summary.close()
+    assert not (tmp_path / 'summary.sqlite').exists()
+
+
+def test_stale_spill_file_is_not_reused(tmp_path):
+    spill_path = tmp_path / 'summary.sqlite'
+    # Execução interrompida: o arquivo fica no disco sem close()
+    interrupted = SpillableDailySummary(1, spill_path)
+    for date in ['20240301', '20240302', '20240303']:
+        count(interrupted, date, 'A')
+    interrupted.spill()
+    interrupted.conn.close()
+    assert spill_path.exists()
+
+    summary = SpillableDailySummary(1, spill_path)
+    for date in ['20240301', '20240302', '20240303']:
+        count(summary, date, 'A')
+
+    assert [day['total'] for day in summary.values()] == [1, 1, 1]
+    summary.close()
+    summary.close()
+    assert not spill_path.exists()
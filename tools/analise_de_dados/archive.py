@@ -0,0 +1,238 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent.parent.parent / 'results'
+ARCHIVE_DIR = RESULTS_DIR / 'archive'
+COMPARISON_TYPES = ['internal_inconsistencies', 'stock_inconsistencies']
+DEFAULT_KEEP_DAYS = 30  # Arquivos diários mais recentes que isso continuam em JSON
+
+DAILY_FILE_PATTERN = re.compile(r'^inconsistencies_(\d{8})\.json$')
+MANIFEST_NAME = '_manifest.json'
+
+
+def _partition_path(archive_dir: Path, comparison_type: str, month: str) -> Path:
+    """Caminho da partição mensal (YYYY-MM) de um tipo de comparação"""
+    return archive_dir / comparison_type / f"{month}.jsonl.gz"
+
+
+def _load_manifest(type_dir: Path) -> Dict[str, Dict]:
+    """Lê o manifesto: por partição, o tamanho confirmado do arquivo e o hash de cada dia compactado"""
+    manifest_path = type_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(type_dir: Path, manifest: Dict[str, Dict]):
+    manifest_path = type_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    tmp_path.replace(manifest_path)
+
+
+def _file_hash(filepath: Path) -> str:
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_records(out, records: Iterable[Dict]) -> int:
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def _sync(path: Path):
+    """Garante que o arquivo está no disco antes de atualizar o manifesto"""
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _record_date(record: Dict) -> str:
+    return (record.get('data_movimento') or '')[:10].replace('-', '')
+
+
+def _append_day(partition: Path, records: List[Dict]):
+    """Anexa o dia como um novo membro gzip, fechado e sincronizado"""
+    with gzip.open(partition, 'at', encoding='utf-8') as out:
+        _write_records(out, records)
+    _sync(partition)
+
+
+def _tmp_path(partition: Path) -> Path:
+    return partition.with_name(partition.name + '.tmp')
+
+
+def _write_replacement(partition: Path, date: str, records: List[Dict]) -> Path:
+    """Grava ao lado da partição uma cópia com os registros de um dia já arquivado trocados pelos novos"""
+    tmp_path = _tmp_path(partition)
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as out:
+        if partition.exists():
+            with gzip.open(partition, 'rt', encoding='utf-8') as f:
+                _write_records(out, (
+                    record for record in (json.loads(line) for line in f if line.strip())
+                    if _record_date(record) != date
+                ))
+        _write_records(out, records)
+    _sync(tmp_path)
+    return tmp_path
+
+
+def _recover_partition(partition: Path, entry: Dict) -> bool:
+    """Desfaz ou conclui uma operação interrompida na partição; devolve True se o manifesto mudou.
+
+    - troca pendente (manifesto já gravado com a nova versão): conclui a troca pelo .tmp
+    - .tmp sem troca pendente: reescrita não confirmada, o arquivo é descartado
+    - partição maior que o tamanho confirmado: membro gzip anexado sem manifesto, é cortado
+    """
+    tmp_path = _tmp_path(partition)
+    if entry.pop('pending_replace', False):
+        if tmp_path.exists():
+            tmp_path.replace(partition)
+        return True
+
+    tmp_path.unlink(missing_ok=True)
+    if partition.exists() and partition.stat().st_size > entry['bytes']:
+        with open(partition, 'r+b') as f:
+            f.truncate(entry['bytes'])
+    return False
+
+
+def compact_results(results_dir: Path = RESULTS_DIR, archive_dir: Path = ARCHIVE_DIR,
+                    keep_days: int = DEFAULT_KEEP_DAYS, remove_source: bool = True) -> Dict:
+    """Converte os JSON diários antigos em JSONL comprimido com gzip, particionado por mês.
+
+    Cada arquivo diário novo vira um membro gzip anexado à partição do mês. Um dia
+    já arquivado que reaparece com outro conteúdo (a conciliação reprocessa todo o
+    histórico) tem seus registros substituídos na partição. Só são removidos os
+    arquivos cujo conteúdo, pelo hash, está no arquivo compactado.
+    """
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y%m%d")
+    stats = {'files': 0, 'replaced': 0, 'records': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+    for comparison_type in COMPARISON_TYPES:
+        source_dir = Path(results_dir) / comparison_type
+        if not source_dir.exists():
+            continue
+
+        type_dir = Path(archive_dir) / comparison_type
+        type_dir.mkdir(parents=True, exist_ok=True)
+        manifest = _load_manifest(type_dir)
+
+        for filepath in sorted(source_dir.glob('inconsistencies_*.json')):
+            match = DAILY_FILE_PATTERN.match(filepath.name)
+            if not match or match.group(1) >= cutoff:
+                continue
+
+            date = match.group(1)
+            month = f"{date[:4]}-{date[4:6]}"
+            partition = _partition_path(archive_dir, comparison_type, month)
+            entry = manifest.setdefault(month, {'bytes': 0, 'files': {}})
+            if _recover_partition(partition, entry):
+                _save_manifest(type_dir, manifest)
+
+            file_hash = _file_hash(filepath)
+            archived_hash = entry['files'].get(filepath.name, '')
+            if archived_hash != file_hash:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+
+                size_before = entry['bytes']
+                if filepath.name in entry['files']:
+                    # O manifesto é gravado com a troca pendente antes de trocar o arquivo:
+                    # uma interrupção em qualquer ponto é concluída por _recover_partition
+                    tmp_path = _write_replacement(partition, date, records)
+                    entry['bytes'] = tmp_path.stat().st_size
+                    entry['files'][filepath.name] = file_hash
+                    entry['pending_replace'] = True
+                    _save_manifest(type_dir, manifest)
+                    tmp_path.replace(partition)
+                    del entry['pending_replace']
+                    stats['replaced'] += 1
+                else:
+                    _append_day(partition, records)
+                    entry['bytes'] = partition.stat().st_size
+                    entry['files'][filepath.name] = file_hash
+                    stats['files'] += 1
+                _save_manifest(type_dir, manifest)
+
+                stats['records'] += len(records)
+                stats['bytes_before'] += filepath.stat().st_size
+                stats['bytes_after'] += entry['bytes'] - size_before
+
+            # O conteúdo atual do arquivo está no manifesto: pode ser removido com segurança
+            if remove_source and entry['files'].get(filepath.name) == file_hash:
+                filepath.unlink()
+
+    return stats
+
+
+def iter_archived(comparison_type: str, month_from: Optional[str] = None,
+                  month_to: Optional[str] = None,
+                  archive_dir: Path = ARCHIVE_DIR) -> Iterator[Dict]:
+    """Lê as inconsistências arquivadas de forma preguiçosa, um registro por vez.
+
+    Os meses são filtrados pelo nome da partição (YYYY-MM, intervalo fechado).
+    """
+    type_dir = Path(archive_dir) / comparison_type
+    if not type_dir.exists():
+        return
+
+    for partition in sorted(type_dir.glob('*.jsonl.gz')):
+        month = partition.name[:7]
+        if month_from and month < month_from:
+            continue
+        if month_to and month > month_to:
+            continue
+        with gzip.open(partition, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquivo comprimido das inconsistências históricas")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compact = subparsers.add_parser('compact', help="Compacta os JSON diários antigos")
+    compact.add_argument('--keep-days', type=int, default=DEFAULT_KEEP_DAYS,
+                         help="Mantém em JSON os arquivos dos últimos N dias")
+    compact.add_argument('--keep-source', action='store_true',
+                         help="Não remove os JSON diários após compactar")
+
+    read = subparsers.add_parser('read', help="Lê registros arquivados como JSONL")
+    read.add_argument('comparison_type', choices=COMPARISON_TYPES)
+    read.add_argument('--from', dest='month_from', help="Mês inicial (YYYY-MM)")
+    read.add_argument('--to', dest='month_to', help="Mês final (YYYY-MM)")
+
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        stats = compact_results(keep_days=args.keep_days, remove_source=not args.keep_source)
+        print(f"Arquivos compactados: {stats['files']}")
+        print(f"Dias substituídos: {stats['replaced']}")
+        print(f"Registros arquivados: {stats['records']:,}")
+        print(f"Tamanho: {stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes")
+    else:
+        for record in iter_archived(args.comparison_type, args.month_from, args.month_to):
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import heapq
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+DEFAULT_FETCH_BATCH = 10000
+MERGE_BLOCK = 65536  # Chaves convertidas/lidas/escritas por vez na montagem e no merge das runs
+KEY_DTYPE = 'S'  # Chaves em bytes UTF-8 (o dtype 'U' ocupa 4 bytes por caractere)
+
+
+def _field_values(collection, field: str, batch_size: int) -> Iterator:
+    """Valores do campo em streaming (campos array são achatados)"""
+    cursor = collection.find(
+        {field: {"$exists": True}}, {"_id": 0, field: 1}
+    ).batch_size(batch_size)
+    try:
+        for doc in cursor:
+            value = doc.get(field)
+            if isinstance(value, list):
+                yield from value
+            else:
+                yield value
+    finally:
+        cursor.close()
+
+
+def _encode(key) -> bytes:
+    return str(key).encode('utf-8')
+
+
+def _key_blocks(keys: Iterable, block_size: int = MERGE_BLOCK) -> Iterator[np.ndarray]:
+    """Converte as chaves em arrays de bytes de até block_size itens (valores vazios são ignorados)"""
+    block = []
+    for key in keys:
+        if key is None or key == '':
+            continue
+        block.append(_encode(key))
+        if len(block) >= block_size:
+            yield np.array(block, dtype=KEY_DTYPE)
+            block = []
+    if block:
+        yield np.array(block, dtype=KEY_DTYPE)
+
+
+def _empty_keys() -> np.ndarray:
+    return np.array([], dtype=f'{KEY_DTYPE}1')
+
+
+def _iter_run(path: Path) -> Iterator[bytes]:
+    """Lê uma run ordenada do disco em blocos"""
+    run = np.load(path, mmap_mode='r', allow_pickle=False)
+    for start in range(0, len(run), MERGE_BLOCK):
+        yield from run[start:start + MERGE_BLOCK].tolist()
+
+
+def _merge_unique(runs: List[Path]) -> Iterator[bytes]:
+    """Merge das runs ordenadas, descartando repetições"""
+    previous = None
+    for key in heapq.merge(*(_iter_run(run) for run in runs)):
+        if key != previous:
+            yield key
+            previous = key
+
+
+class KeyIndex:
+    """Índice de pertinência compacto: array NumPy ordenado de chaves com busca binária"""
+
+    def __init__(self, keys: np.ndarray):
+        # As chaves já devem estar ordenadas e sem repetição (ver from_iterable)
+        self.keys = keys
+
+    @classmethod
+    def from_iterable(cls, keys: Iterable) -> 'KeyIndex':
+        """Constrói o índice a partir de qualquer iterável de chaves (valores vazios são ignorados).
+
+        As chaves são convertidas em blocos, sem montar uma lista Python com todas elas.
+        """
+        blocks = [np.unique(block) for block in _key_blocks(keys)]
+        if not blocks:
+            return cls(_empty_keys())
+        return cls(np.unique(np.concatenate(blocks)))
+
+    @classmethod
+    def from_collection(cls, collection, field: str, batch_size: int = DEFAULT_FETCH_BATCH) -> 'KeyIndex':
+        """Lê apenas o campo indicado da collection e monta o índice (campos array são achatados)"""
+        return cls.from_iterable(_field_values(collection, field, batch_size))
+
+    @classmethod
+    def from_collection_external(cls, collection, field: str, output_path: Path, run_size: int,
+                                 batch_size: int = DEFAULT_FETCH_BATCH) -> 'KeyIndex':
+        """Monta o índice com memória limitada: runs ordenadas de até run_size chaves são
+        gravadas em disco e depois mescladas direto no arquivo final, usado via mmap.
+        """
+        output_path = Path(output_path)
+        runs_dir = output_path.parent / f"{output_path.stem}_runs"
+        runs_dir.mkdir(parents=True, exist_ok=True)
+        runs: List[Path] = []
+
+        def write_run(blocks):
+            run_path = runs_dir / f"run_{len(runs):05d}.npy"
+            np.save(run_path, np.unique(np.concatenate(blocks)), allow_pickle=False)
+            runs.append(run_path)
+
+        try:
+            blocks, pending = [], 0
+            for block in _key_blocks(_field_values(collection, field, batch_size), min(MERGE_BLOCK, run_size)):
+                blocks.append(block)
+                pending += len(block)
+                if pending >= run_size:
+                    write_run(blocks)
+                    blocks, pending = [], 0
+            if blocks:
+                write_run(blocks)
+
+            if not runs:
+                index = cls(_empty_keys())
+                index.save(output_path)
+                return index
+
+            # Primeira passada conta as chaves distintas; a segunda grava no arquivo final
+            width = max(np.load(run, mmap_mode='r').dtype.itemsize for run in runs)
+            total = sum(1 for _ in _merge_unique(runs))
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            out = np.lib.format.open_memmap(output_path, mode='w+', dtype=f'{KEY_DTYPE}{width}', shape=(total,))
+            block, position = [], 0
+            for key in _merge_unique(runs):
+                block.append(key)
+                if len(block) >= MERGE_BLOCK:
+                    out[position:position + len(block)] = block
+                    position += len(block)
+                    block = []
+            if block:
+                out[position:position + len(block)] = block
+            out.flush()
+            del out
+            return cls.load(output_path)
+        finally:
+            shutil.rmtree(runs_dir, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key) -> bool:
+        return self.contains(key)
+
+    def contains(self, key) -> bool:
+        """Verifica se uma chave existe no índice"""
+        if key is None or len(self.keys) == 0:
+            return False
+        key = _encode(key)
+        pos = np.searchsorted(self.keys, key)
+        return bool(pos < len(self.keys) and self.keys[pos] == key)
+
+    def contains_many(self, keys: Iterable) -> np.ndarray:
+        """Consulta vetorizada: devolve um array booleano alinhado com as chaves recebidas"""
+        queries = np.array([b'' if key is None else _encode(key) for key in keys], dtype=KEY_DTYPE)
+        if len(queries) == 0 or len(self.keys) == 0:
+            return np.zeros(len(queries), dtype=bool)
+        pos = np.searchsorted(self.keys, queries)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == queries[found]
+        return found & (queries != b'')
+
+    def save(self, path: Path, metadata: Optional[Dict] = None):
+        """Salva o índice em .npy (com metadados opcionais em .json ao lado)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self.keys, allow_pickle=False)
+        if metadata is not None:
+            _save_metadata(path, metadata)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> 'KeyIndex':
+        """Carrega um índice salvo; com mmap as chaves ficam no disco e são paginadas sob demanda"""
+        return cls(np.load(Path(path), mmap_mode='r' if mmap else None, allow_pickle=False))
+
+
+def _save_metadata(path: Path, metadata: Dict):
+    with open(Path(path).with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+
+def collection_fingerprint(collection) -> Dict:
+    """Identifica o conteúdo atual da collection (recargas geram novos _id)"""
+    last = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return {
+        'count': collection.estimated_document_count(),
+        'last_id': str(last['_id']) if last else None
+    }
+
+
+def load_or_build(collection, field: str, cache_path: Path,
+                  max_keys_in_memory: Optional[int] = None) -> KeyIndex:
+    """Reaproveita o índice salvo se a collection não mudou; senão reconstrói e salva.
+
+    Com max_keys_in_memory o índice é montado por runs em disco (from_collection_external).
+    """
+    cache_path = Path(cache_path)
+    meta_path = cache_path.with_suffix('.json')
+    fingerprint = collection_fingerprint(collection)
+    fingerprint['field'] = field
+    fingerprint['dtype'] = KEY_DTYPE  # índices antigos em 'U' são reconstruídos
+
+    if cache_path.exists() and meta_path.exists():
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == fingerprint:
+                return KeyIndex.load(cache_path)
+
+    # Metadados antigos são removidos antes para não validar um arquivo reconstruído pela metade
+    meta_path.unlink(missing_ok=True)
+    if max_keys_in_memory:
+        index = KeyIndex.from_collection_external(collection, field, cache_path, max_keys_in_memory)
+        _save_metadata(cache_path, fingerprint)
+        return index
+
+    index = KeyIndex.from_collection(collection, field)
+    index.save(cache_path, fingerprint)
+    return index
@@ -0,0 +1,165 @@
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Normalização dos números de documento compartilhada com as cargas
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'processamento_de_dados'))
+from document_keys import document_key  # noqa: E402
+
+# Arquivo SQLite padrão, ao lado dos relatórios em results/
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent.parent / 'results' / 'inconsistencies.sqlite'
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inconsistencias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    comparacao TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    documento TEXT NOT NULL,
+    documento_norm TEXT,
+    data_movimento TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_inc_documento_norm ON inconsistencias (documento_norm, data_movimento);
+CREATE INDEX IF NOT EXISTS idx_inc_tipo ON inconsistencias (tipo, data_movimento);
+CREATE INDEX IF NOT EXISTS idx_inc_data ON inconsistencias (data_movimento);
+"""
+
+
+class ResultsStore:
+    """Armazena as inconsistências em um SQLite indexado por documento, tipo e data_movimento.
+
+    O documento é indexado já normalizado (document_key), então '00123' e '123' são o mesmo CCB.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # A conciliação assíncrona grava a partir de uma thread auxiliar (uma de cada vez)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def reset(self, comparison_type: Optional[str] = None):
+        """Remove os resultados anteriores (de um tipo de comparação ou de todos)"""
+        if comparison_type:
+            self.conn.execute("DELETE FROM inconsistencias WHERE comparacao = ?", (comparison_type,))
+        else:
+            self.conn.execute("DELETE FROM inconsistencias")
+        self.conn.commit()
+
+    def insert_many(self, inconsistencies: Iterable[Dict], comparison_type: str) -> int:
+        """Insere um lote de inconsistências em uma única transação"""
+        rows = [
+            (
+                comparison_type,
+                inc['tipo'],
+                str(inc['documento']),
+                document_key(inc['documento']),
+                (inc.get('data_movimento') or '')[:10] or None,
+                json.dumps(inc, ensure_ascii=False)
+            )
+            for inc in inconsistencies
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO inconsistencias (comparacao, tipo, documento, documento_norm, data_movimento, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def query(self, documento: Optional[str] = None, tipo: Optional[str] = None,
+              data_inicio: Optional[str] = None, data_fim: Optional[str] = None,
+              comparacao: Optional[str] = None, page: int = 1,
+              page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """Consulta paginada; datas no formato YYYY-MM-DD (intervalo fechado)"""
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+
+        filters = []
+        params: List = []
+        if documento:
+            filters.append("documento_norm = ?")
+            params.append(document_key(documento))
+        if tipo:
+            filters.append("tipo = ?")
+            params.append(tipo)
+        if comparacao:
+            filters.append("comparacao = ?")
+            params.append(comparacao)
+        if data_inicio:
+            filters.append("data_movimento >= ?")
+            params.append(data_inicio)
+        if data_fim:
+            filters.append("data_movimento <= ?")
+            params.append(data_fim)
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+        total = self.conn.execute(
+            f"SELECT COUNT(*) FROM inconsistencias {where}", params
+        ).fetchone()[0]
+        rows = self.conn.execute(
+            f"SELECT comparacao, payload FROM inconsistencias {where} "
+            f"ORDER BY data_movimento, id LIMIT ? OFFSET ?",
+            params + [page_size, (page - 1) * page_size]
+        ).fetchall()
+
+        items = []
+        for row in rows:
+            item = json.loads(row['payload'])
+            item['comparacao'] = row['comparacao']
+            items.append(item)
+
+        return {
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': (total + page_size - 1) // page_size,
+            'items': items
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+def query_inconsistencies(db_path: Path = DEFAULT_DB_PATH, **filters) -> Dict:
+    """Atalho para consultar o SQLite sem manter a conexão aberta"""
+    store = ResultsStore(db_path)
+    try:
+        return store.query(**filters)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta as inconsistências armazenadas no SQLite")
+    parser.add_argument('--documento', help="Número do documento (CCB)")
+    parser.add_argument('--tipo', help="Tipo de inconsistência, ex: 'Status Inconsistente'")
+    parser.add_argument('--inicio', dest='data_inicio', help="Data inicial (YYYY-MM-DD)")
+    parser.add_argument('--fim', dest='data_fim', help="Data final (YYYY-MM-DD)")
+    parser.add_argument('--comparacao', help="internal_inconsistencies ou stock_inconsistencies")
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--db', type=Path, default=DEFAULT_DB_PATH, help="Caminho do arquivo SQLite")
+    args = parser.parse_args()
+
+    result = query_inconsistencies(
+        args.db,
+        documento=args.documento,
+        tipo=args.tipo,
+        data_inicio=args.data_inicio,
+        data_fim=args.data_fim,
+        comparacao=args.comparacao,
+        page=args.page,
+        page_size=args.page_size
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
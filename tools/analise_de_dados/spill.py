@@ -0,0 +1,128 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+# Estimativas de memória usadas para decidir quando descarregar em disco
+SUMMARY_DATE_BYTES = 600  # dia com o dicionário {'total', 'by_type'}
+SUMMARY_TYPE_BYTES = 150  # cada tipo de inconsistência dentro do dia
+
+
+class SpillableDailySummary:
+    """Sumário diário {data: {'total': n, 'by_type': {...}}} com limite de memória.
+
+    Os contadores do dia são acumulados em memória (summary[data]); ao passar do
+    orçamento, eles são somados em um SQLite e liberados. A leitura (len, in,
+    keys, items, values) sempre enxerga os dias consolidados, memória + disco.
+    """
+
+    def __init__(self, budget_bytes: Optional[int] = None, spill_path: Optional[Path] = None):
+        self.days: Dict[str, Dict] = {}
+        self.budget_bytes = budget_bytes
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.conn = None
+        self.spills = 0
+
+    def start_day(self, date: str):
+        """Garante os contadores do dia em memória (descarregando em disco antes, se preciso)"""
+        if date not in self.days:
+            self.maybe_spill()
+            self.days[date] = {'total': 0, 'by_type': {}}
+
+    def __getitem__(self, date: str) -> Dict:
+        # Contadores em memória do dia (ver start_day); podem ser só uma parte do total já em disco
+        return self.days[date]
+
+    def __contains__(self, date) -> bool:
+        if date in self.days:
+            return True
+        if self.conn is None:
+            return False
+        return self.conn.execute("SELECT 1 FROM dias WHERE data = ?", (date,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        if self.conn is None:
+            return len(self.days)
+        self.spill()
+        return self.conn.execute("SELECT COUNT(*) FROM dias").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def estimated_bytes(self) -> int:
+        return sum(
+            SUMMARY_DATE_BYTES + SUMMARY_TYPE_BYTES * len(day['by_type'])
+            for day in self.days.values()
+        )
+
+    def maybe_spill(self):
+        """Descarrega as contagens em disco se o orçamento foi excedido"""
+        if self.budget_bytes and self.spill_path and self.estimated_bytes() > self.budget_bytes:
+            self.spill()
+
+    def _connect(self):
+        if self.conn is None:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            # Um arquivo deixado por uma execução interrompida não pode somar nas contagens desta
+            self.spill_path.unlink(missing_ok=True)
+            self.conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS dias (data TEXT PRIMARY KEY, total INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS tipos (
+                    data TEXT NOT NULL, tipo TEXT NOT NULL, quantidade INTEGER NOT NULL,
+                    PRIMARY KEY (data, tipo)
+                );
+            """)
+        return self.conn
+
+    def spill(self):
+        """Soma as contagens em memória no SQLite e libera o dicionário"""
+        if not self.days:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO dias (data, total) VALUES (?, ?) "
+                "ON CONFLICT(data) DO UPDATE SET total = total + excluded.total",
+                [(date, day['total']) for date, day in self.days.items()]
+            )
+            conn.executemany(
+                "INSERT INTO tipos (data, tipo, quantidade) VALUES (?, ?, ?) "
+                "ON CONFLICT(data, tipo) DO UPDATE SET quantidade = quantidade + excluded.quantidade",
+                [
+                    (date, tipo, quantidade)
+                    for date, day in self.days.items()
+                    for tipo, quantidade in day['by_type'].items()
+                ]
+            )
+        self.days.clear()
+        self.spills += 1
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """Dias consolidados (memória + disco), lidos em streaming do SQLite quando houve spill"""
+        if self.conn is None:
+            yield from sorted(self.days.items())
+            return
+
+        self.spill()
+        by_type = self.conn.execute("SELECT data, tipo, quantidade FROM tipos ORDER BY data")
+        pending = next(by_type, None)
+        for date, total in self.conn.execute("SELECT data, total FROM dias ORDER BY data"):
+            day = {'total': total, 'by_type': {}}
+            while pending is not None and pending[0] == date:
+                day['by_type'][pending[1]] = pending[2]
+                pending = next(by_type, None)
+            yield date, day
+
+    def keys(self) -> Iterator[str]:
+        return (date for date, _ in self.items())
+
+    def values(self) -> Iterator[Dict]:
+        return (day for _, day in self.items())
+
+    def close(self):
+        """Fecha e remove o arquivo temporário (pode ser chamado mais de uma vez)"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.spill_path is not None:
+            self.spill_path.unlink(missing_ok=True)
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+from pymongo.write_concern import WriteConcern
+
+# Configurações da carga em lote (ajustáveis por variável de ambiente)
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '5000'))
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', '4'))
+BULK_BYPASS_VALIDATION = os.getenv('BULK_BYPASS_VALIDATION', 'false').lower() == 'true'
+# Ex: BULK_WRITE_CONCERN_W=1 (ou 0 para não aguardar confirmação); vazio usa o padrão do cliente
+BULK_WRITE_CONCERN_W = os.getenv('BULK_WRITE_CONCERN_W', '')
+
+
+def default_write_concern() -> Optional[WriteConcern]:
+    """Write concern configurado para cargas em lote, se houver"""
+    if not BULK_WRITE_CONCERN_W:
+        return None
+    w = int(BULK_WRITE_CONCERN_W) if BULK_WRITE_CONCERN_W.isdigit() else BULK_WRITE_CONCERN_W
+    return WriteConcern(w=w)
+
+
+def records_without_nulls(chunk: pd.DataFrame) -> List[Dict]:
+    """Registros da fatia com NaN/NaT/NA trocados por None (o BSON não aceita NaT)"""
+    return chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+
+
+def iter_records(df: pd.DataFrame, to_records: Callable[[pd.DataFrame], List[Dict]] = records_without_nulls,
+                 chunk_size: int = BULK_BATCH_SIZE) -> Iterator[Dict]:
+    """Gera os registros do DataFrame em fatias, sem materializar todos os dicionários de uma vez"""
+    for start in range(0, len(df), chunk_size):
+        yield from to_records(df.iloc[start:start + chunk_size])
+
+
+def _batches(records: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(collection, records: Iterable[Dict], batch_size: int = BULK_BATCH_SIZE,
+                workers: int = BULK_WORKERS, bypass_document_validation: bool = BULK_BYPASS_VALIDATION,
+                write_concern: Optional[WriteConcern] = None) -> Dict:
+    """Insere os registros com insert_many(ordered=False) em lotes enviados por várias threads.
+
+    No máximo 2 lotes por thread ficam em memória aguardando envio.
+    """
+    write_concern = write_concern or default_write_concern()
+    if write_concern is not None:
+        collection = collection.with_options(write_concern=write_concern)
+
+    def insert(batch: List[Dict]) -> int:
+        collection.insert_many(
+            batch,
+            ordered=False,
+            bypass_document_validation=bypass_document_validation
+        )
+        return len(batch)
+
+    inserted = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for batch in _batches(records, batch_size):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                inserted += sum(future.result() for future in done)
+            pending.add(executor.submit(insert, batch))
+        inserted += sum(future.result() for future in pending)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'inserted': inserted,
+        'seconds': elapsed,
+        'docs_per_sec': inserted / elapsed if elapsed > 0 else 0.0
+    }
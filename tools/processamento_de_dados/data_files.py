@@ -0,0 +1,13 @@
+from pathlib import Path
+from typing import Dict, List
+
+# Raiz do projeto (os CSVs de liquidados e estoque ficam em data/)
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+INTERNAL_DATA_DIR = Path('/home/ofb100707/Documents/PDI/001_MultiAgents/data')
+
+# Arquivos lidos por cada script de carga; main.py usa a mesma lista na memoização das ferramentas
+DATA_FILES: Dict[str, List[Path]] = {
+    'internal': [INTERNAL_DATA_DIR / f'internal_data_part_{i}.csv' for i in (1, 2, 3)],
+    'liquidated': [BASE_DIR / 'data' / 'liquidated.csv'],
+    'stock': [BASE_DIR / 'data' / 'stock.csv']
+}
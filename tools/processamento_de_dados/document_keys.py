@@ -0,0 +1,56 @@
+import math
+import re
+from typing import Iterable, List, Optional
+
+# Campo com as chaves normalizadas usadas na conciliação
+RECONCILIATION_KEYS_FIELD = 'CHAVES_CONCILIACAO'
+INTERNAL_KEY_FIELD = 'ccb_number_norm'
+
+# Tipos de chave: só chaves do mesmo tipo casam entre as bases (DOC:123 != SN:123)
+DOCUMENT_KEY = 'DOC'      # DOCUMENTO (liquidados), NU_DOCUMENTO (estoque) e ccb_number (interna)
+SEU_NUMERO_KEY = 'SN'     # SEU_NUMERO (liquidados e estoque)
+
+_NON_ALNUM = re.compile(r'[^0-9A-Za-z]')
+
+
+def normalize_document(value) -> Optional[str]:
+    """Canoniza um número de documento: sem pontuação, maiúsculo e sem zeros à esquerda.
+
+    Floats inteiros lidos pelo pandas (ex: 123.0) perdem a parte decimal; textos não
+    são reinterpretados, então '10.000' e '10.001' viram '10000' e '10001'.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            value = int(value)
+
+    text = _NON_ALNUM.sub('', str(value)).upper()
+    if not text:
+        return None
+    return text.lstrip('0') or '0'
+
+
+def typed_key(kind: str, value) -> Optional[str]:
+    """Chave normalizada com o prefixo do tipo, ex: 'DOC:123'"""
+    key = normalize_document(value)
+    return f"{kind}:{key}" if key else None
+
+
+def document_key(value) -> Optional[str]:
+    """Chave de número de documento (DOCUMENTO, NU_DOCUMENTO ou ccb_number)"""
+    return typed_key(DOCUMENT_KEY, value)
+
+
+def reconciliation_keys(documento=None, seu_numero=None) -> List[str]:
+    """Chaves tipadas de um registro, na ordem de prioridade: documento e depois SEU_NUMERO"""
+    keys = [document_key(documento), typed_key(SEU_NUMERO_KEY, seu_numero)]
+    return [key for key in keys if key]
+
+
+def document_keys_only(keys: Iterable[str]) -> List[str]:
+    """Filtra as chaves de documento (as únicas comparáveis com a base interna)"""
+    prefix = f"{DOCUMENT_KEY}:"
+    return [key for key in keys if key.startswith(prefix)]
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, IndexModel, MongoClient
+
+from document_keys import INTERNAL_KEY_FIELD, RECONCILIATION_KEYS_FIELD
+
+# Índice composto que cobre a busca de status interno (a consulta não lê os documentos)
+INTERNAL_STATUS_INDEX = [(INTERNAL_KEY_FIELD, ASCENDING), ("contract_status", ASCENDING)]
+
+# Índices por collection: (banco, collection) -> lista de chaves compostas.
+# Inclui os índices usados pelas consultas da conciliação em main.py.
+INDEX_SPECS: Dict[Tuple[str, str], List[List[Tuple[str, int]]]] = {
+    ('open', 'loans'): [
+        [("contract_id", ASCENDING)],
+        [("installment_id", ASCENDING)],
+        [("ccb_number", ASCENDING)],
+        [("contract_status", ASCENDING)],
+        [("installment_status", ASCENDING)],
+        [("contract_funding_source", ASCENDING)],
+        INTERNAL_STATUS_INDEX,
+    ],
+    ('investment_funds', 'liquidated'): [
+        [("FUNDO", ASCENDING)],
+        [("DATA_MOVIMENTO", ASCENDING)],
+        [("DOCUMENTO", ASCENDING)],
+        [("SEU_NUMERO", ASCENDING)],
+        [("TIPO_MOVIMENTO", ASCENDING)],
+        [("SACADO", ASCENDING)],
+        [(RECONCILIATION_KEYS_FIELD, ASCENDING)],
+    ],
+    ('investment_funds', 'stock'): [
+        [("NOME_FUNDO", ASCENDING)],
+        [("DOC_FUNDO", ASCENDING)],
+        [("NOME_SACADO", ASCENDING)],
+        [("NU_DOCUMENTO", ASCENDING)],
+        [("SEU_NUMERO", ASCENDING)],
+        [("DATA_VENCIMENTO_ORIGINAL", ASCENDING)],
+        [("SITUACAO_RECEBIVEL", ASCENDING)],
+        [(RECONCILIATION_KEYS_FIELD, ASCENDING)],
+    ],
+}
+
+
+def _key(spec) -> Tuple:
+    return tuple((field, int(direction)) for field, direction in spec)
+
+
+def ensure_collection_indexes(collection, specs: List[List[Tuple[str, int]]]) -> Dict:
+    """Cria de uma vez só os índices que ainda não existem na collection"""
+    existing = {_key(info['key']) for info in collection.index_information().values()}
+    missing = [spec for spec in specs if _key(spec) not in existing]
+
+    start = time.perf_counter()
+    if missing:
+        collection.create_indexes([IndexModel(spec) for spec in missing])
+    return {
+        'collection': f"{collection.database.name}.{collection.name}",
+        'created': len(missing),
+        'skipped': len(specs) - len(missing),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def apply_indexes(client: MongoClient, specs: Dict = INDEX_SPECS) -> List[Dict]:
+    """Fase de indexação: aplica o spec em todas as collections em paralelo"""
+    with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+        futures = [
+            executor.submit(ensure_collection_indexes, client[db_name][coll_name], coll_specs)
+            for (db_name, coll_name), coll_specs in specs.items()
+        ]
+        return [future.result() for future in futures]
+
+
+def format_index_report(report: List[Dict]) -> str:
+    """Resumo em texto do tempo de criação dos índices"""
+    lines = ["Índices por collection:"]
+    for item in report:
+        lines.append(
+            f"- {item['collection']}: {item['created']} criados, {item['skipped']} já existiam "
+            f"({item['seconds']:.2f}s)"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
+    try:
+        client.server_info()
+        print(format_index_report(apply_indexes(client)))
+    finally:
+        client.close()
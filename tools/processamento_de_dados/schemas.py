@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Registro de schemas das fontes CSV.
+# - read_options: parâmetros repassados ao pd.read_csv
+# - required: colunas que precisam existir no cabeçalho
+# - categories: colunas com poucos valores distintos, lidas como 'category'
+# - strings: identificadores lidos como texto (evita virar float e perder zeros à esquerda)
+# - dates: coluna -> formato de data ('ISO8601' aceita datas com ou sem hora)
+SCHEMAS: Dict[str, Dict] = {
+    'internal': {
+        'read_options': {},
+        'required': ['ccb_number', 'contract_status'],
+        'categories': [
+            'contract_status', 'installment_status', 'contract_funding_source'
+        ],
+        'strings': ['ccb_number', 'payments'],
+        'dates': {
+            'contract_created_date': 'ISO8601',
+            'contract_approved_date': 'ISO8601',
+            'contract_signed_date': 'ISO8601',
+            'contract_granted_date': 'ISO8601',
+            'contract_fully_paid_date': 'ISO8601',
+            'installment_created': 'ISO8601',
+            'payment_plan_created': 'ISO8601',
+            'installment_due_date': 'ISO8601',
+            'installment_paid_date': 'ISO8601'
+        }
+    },
+    'liquidated': {
+        'read_options': {'sep': ';', 'encoding': 'utf-8'},
+        'required': ['DOCUMENTO', 'DATA_MOVIMENTO', 'DATA_AQUISICAO', 'DATA_VENCIMENTO'],
+        'categories': ['FUNDO', 'TIPO_MOVIMENTO', 'SITUACAO_RECEBIVEL'],
+        'strings': [
+            'DOCUMENTO', 'SEU_NUMERO', 'VL_AQUISICAO', 'VALOR_VENCIMENTO', 'VL_PRESENTE',
+            'VALOR_PAGO', 'AJUSTE', 'VALOR_NOMINAL', 'VALOR_PRESENTE', 'JUROS', 'TX_AQUISICAO'
+        ],
+        'dates': {
+            'DATA_MOVIMENTO': '%d/%m/%Y',
+            'DATA_AQUISICAO': '%d/%m/%Y',
+            'DATA_VENCIMENTO': '%d/%m/%Y'
+        }
+    },
+    'stock': {
+        'read_options': {'sep': ';', 'encoding': 'utf-8'},
+        'required': [
+            'NU_DOCUMENTO', 'SEU_NUMERO', 'DATA_FUNDO', 'DATA_REFERENCIA',
+            'DATA_VENCIMENTO_ORIGINAL', 'DATA_VENCIMENTO_AJUSTADA', 'DATA_EMISSAO',
+            'DATA_AQUISICAO', 'VALOR_NOMINAL', 'VALOR_PRESENTE', 'VALOR_AQUISICAO',
+            'VALOR_PDD', 'TAXA_CESSAO', 'TX_RECEBIVEL', 'PRAZO', 'PRAZO_ATUAL',
+            'SEU_NUMERO_MULTIPAG'
+        ],
+        'categories': ['NOME_FUNDO', 'DOC_FUNDO', 'SITUACAO_RECEBIVEL'],
+        'strings': [
+            'NU_DOCUMENTO', 'SEU_NUMERO', 'VALOR_NOMINAL', 'VALOR_PRESENTE',
+            'VALOR_AQUISICAO', 'VALOR_PDD', 'TAXA_CESSAO', 'TX_RECEBIVEL'
+        ],
+        'dates': {
+            'DATA_FUNDO': '%d/%m/%Y',
+            'DATA_REFERENCIA': '%d/%m/%Y',
+            'DATA_VENCIMENTO_ORIGINAL': '%d/%m/%Y',
+            'DATA_VENCIMENTO_AJUSTADA': '%d/%m/%Y',
+            'DATA_EMISSAO': '%d/%m/%Y',
+            'DATA_AQUISICAO': '%d/%m/%Y'
+        }
+    }
+}
+
+
+def validate_header(file_path: Path, schema_name: str) -> list:
+    """Lê apenas o cabeçalho e falha cedo se faltar alguma coluna obrigatória"""
+    schema = SCHEMAS[schema_name]
+    columns = list(pd.read_csv(file_path, nrows=0, **schema['read_options']).columns)
+    missing = [col for col in schema['required'] if col not in columns]
+    if missing:
+        raise ValueError(
+            f"Arquivo {Path(file_path).name} sem as colunas obrigatórias: {', '.join(missing)}"
+        )
+    return columns
+
+
+def read_csv_with_schema(file_path: Path, schema_name: str) -> pd.DataFrame:
+    """Lê um CSV com os tipos declarados no schema e converte as colunas de data"""
+    schema = SCHEMAS[schema_name]
+    columns = set(validate_header(file_path, schema_name))
+
+    dtype = {col: str for col in schema['strings'] if col in columns}
+    dtype.update({col: 'category' for col in schema['categories'] if col in columns})
+
+    df = pd.read_csv(file_path, dtype=dtype, **schema['read_options'])
+
+    for col, date_format in schema['dates'].items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=date_format, errors='coerce')
+
+    return df
+
+
+def concat_with_schema(dfs: List[pd.DataFrame], schema_name: str) -> pd.DataFrame:
+    """Concatena partes lidas com o mesmo schema mantendo as colunas 'category'.
+
+    Cada arquivo gera categorias próprias e o pd.concat converteria a coluna para
+    object; as categorias são unificadas antes para todas as partes terem o mesmo dtype.
+    """
+    if len(dfs) == 1:
+        return dfs[0]
+
+    for col in SCHEMAS[schema_name]['categories']:
+        if not all(col in df.columns for df in dfs):
+            continue
+        categories = union_categoricals([df[col] for df in dfs], ignore_order=True).categories
+        dtype = pd.CategoricalDtype(categories)
+        for df in dfs:
+            df[col] = df[col].astype(dtype)
+
+    return pd.concat(dfs, ignore_index=True)
+
+
+def format_dates_iso(df: pd.DataFrame, schema_name: str) -> pd.DataFrame:
+    """Converte as datas já lidas em texto ISO (Timestamp.isoformat, com microssegundos e fuso)"""
+    for col in SCHEMAS[schema_name]['dates']:
+        if col in df.columns:
+            df[col] = df[col].map(lambda value: value.isoformat() if pd.notnull(value) else None)
+    return df
@@ -1,10 +1,12 @@
-import pandas as pd
 from pymongo import MongoClient
 import json
 from datetime import datetime
 import os
-from pathlib import Path
 from pprint import pprint
+from document_keys import INTERNAL_KEY_FIELD, document_key
+from schemas import concat_with_schema, format_dates_iso, read_csv_with_schema
+from data_files import DATA_FILES
+from bulk_writer import bulk_insert, iter_records
 
 def convert_string_to_float(value):
     """Converte strings numéricas para float"""
@@ -50,32 +52,21 @@ def process_dataframe(df):
     if 'payments' in df.columns:
         df['payments'] = df['payments'].apply(convert_json_string)
 
-    # Converter colunas de data
-    date_columns = [
-        'contract_created_date', 'contract_approved_date',
-        'contract_signed_date', 'contract_granted_date',
-        'contract_fully_paid_date', 'installment_created',
-        'payment_plan_created', 'installment_due_date',
-        'installment_paid_date'
-    ]
+    # Datas já convertidas por read_csv_with_schema, gravadas como texto ISO para evitar problemas de serialização
+    format_dates_iso(df, 'internal')
 
-    for col in date_columns:
-        if col in df.columns:
-            # Converter datas para string ISO format para evitar problemas de serialização
-            df[col] = pd.to_datetime(df[col], errors='coerce').apply(
-                lambda x: x.isoformat() if pd.notnull(x) else None
-            )
+    # Chave normalizada do CCB usada na conciliação com as bases do fundo
+    if 'ccb_number' in df.columns:
+        df[INTERNAL_KEY_FIELD] = df['ccb_number'].map(document_key)
 
     return df
 
+# Resultado da carga lido por main.py; continua None se a carga falhar
+load_stats = None
+
 try:
-    # Definir caminhos dos arquivos
-    data_dir = Path('/home/ofb100707/Documents/PDI/001_MultiAgents/data')
-    files = [
-        data_dir / 'internal_data_part_1.csv',
-        data_dir / 'internal_data_part_2.csv',
-        data_dir / 'internal_data_part_3.csv'
-    ]
+    # Caminhos dos arquivos (declarados em data_files.py)
+    files = DATA_FILES['internal']
 
     # Lista para armazenar todos os DataFrames
     all_dfs = []
@@ -84,16 +75,16 @@ try:
     for file_path in files:
         if file_path.exists():
             print(f"Processando arquivo: {file_path.name}")
-            # Adicionar low_memory=False para evitar warnings de tipos mistos
-            df = pd.read_csv(file_path, low_memory=False)
+            # Tipos e categorias declarados no schema, com validação do cabeçalho
+            df = read_csv_with_schema(file_path, 'internal')
             df_processed = process_dataframe(df)
             all_dfs.append(df_processed)
         else:
             print(f"Arquivo não encontrado: {file_path}")
 
-    # Concatenar todos os DataFrames
+    # Concatenar todos os DataFrames (mantendo as colunas category)
     if all_dfs:
-        final_df = pd.concat(all_dfs, ignore_index=True)
+        final_df = concat_with_schema(all_dfs, 'internal')
         print(f"Total de registros combinados: {len(final_df)}")
 
         # Conectar ao MongoDB
@@ -109,21 +100,16 @@ try:
         db = client['open']
         collection = db['loans']
 
-        # Converter DataFrame para lista de dicionários e inserir no MongoDB
-        # Substituir NaN por None para evitar problemas de serialização
-        records = json.loads(final_df.replace({pd.NA: None}).to_json(orient='records'))
-        result = collection.insert_many(records)
-
-        print(f'Foram inseridos {len(result.inserted_ids)} documentos no MongoDB no banco open')
-
-        # Criar índices para melhorar a performance das consultas
-        collection.create_index([("contract_id", 1)])
-        collection.create_index([("installment_id", 1)])
-        collection.create_index([("ccb_number", 1)])
-        collection.create_index([("contract_status", 1)])
-        collection.create_index([("installment_status", 1)])
-        collection.create_index([("contract_funding_source", 1)])
-        print("Índices criados com sucesso")
+        # Converter o DataFrame em registros por fatias e inserir em lotes paralelos
+        # A serialização via JSON transforma NaN em None
+        records = iter_records(final_df, lambda chunk: json.loads(chunk.to_json(orient='records')))
+        stats = bulk_insert(collection, records)
+
+        print(f"Foram inseridos {stats['inserted']} documentos no MongoDB no banco open "
+              f"({stats['docs_per_sec']:,.0f} docs/s)")
+        load_stats = {**stats, 'expected': len(final_df)}
+
+        # Os índices são criados depois de todas as cargas, na fase de indexação (index_spec.py)
 
         # Mostrar um exemplo dos dados inseridos para validação
         # print("\nExemplo do primeiro registro inserido:")
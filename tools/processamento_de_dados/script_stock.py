@@ -3,8 +3,11 @@ from pymongo import MongoClient
 import locale
 from datetime import datetime
 import os
-from pathlib import Path
 from pprint import pprint
+from document_keys import RECONCILIATION_KEYS_FIELD, reconciliation_keys
+from schemas import read_csv_with_schema
+from data_files import DATA_FILES
+from bulk_writer import bulk_insert, iter_records
 
 # Configurar locale para PT-BR para tratar números com vírgula
 try:
@@ -34,29 +37,19 @@ def convert_percentage(value):
     except:
         return value
 
+# Resultado da carga lido por main.py; continua None se a carga falhar
+load_stats = None
+
 try:
-    # Usar Path para melhor manipulação do caminho do arquivo
-    current_dir = Path(__file__).resolve().parent.parent.parent
-    file_path = current_dir / 'data' / 'stock.csv'
+    # Arquivo está na pasta 'data' (caminho declarado em data_files.py)
+    file_path = DATA_FILES['stock'][0]
 
-    # Definir as colunas de data
-    date_columns = ['DATA_FUNDO', 'DATA_REFERENCIA', 'DATA_VENCIMENTO_ORIGINAL',
-                    'DATA_VENCIMENTO_AJUSTADA', 'DATA_EMISSAO', 'DATA_AQUISICAO']
-    
     # Definir as colunas numéricas que precisam de conversão
     currency_columns = ['VALOR_NOMINAL', 'VALOR_PRESENTE', 'VALOR_AQUISICAO', 'VALOR_PDD']
     percentage_columns = ['TAXA_CESSAO', 'TX_RECEBIVEL']
 
-    # Ler o arquivo CSV
-    df = pd.read_csv(file_path, 
-                     sep=';',
-                     encoding='utf-8',
-                     low_memory=False,  # Evita warning de tipos mistos
-                     dayfirst=True)     # Especifica formato de data brasileiro
-
-    # Converter colunas de data
-    for col in date_columns:
-        df[col] = pd.to_datetime(df[col], format='%d/%m/%Y', errors='coerce')
+    # Ler o arquivo CSV com os tipos do schema (datas já convertidas no formato brasileiro)
+    df = read_csv_with_schema(file_path, 'stock')
 
     # Converter colunas de moeda
     for col in currency_columns:
@@ -71,6 +64,12 @@ try:
     df['PRAZO_ATUAL'] = pd.to_numeric(df['PRAZO_ATUAL'], errors='coerce')
     df['SEU_NUMERO_MULTIPAG'] = pd.to_numeric(df['SEU_NUMERO_MULTIPAG'], errors='coerce')
 
+    # Chaves normalizadas para a conciliação: NU_DOCUMENTO e, como alternativa, SEU_NUMERO
+    df[RECONCILIATION_KEYS_FIELD] = [
+        reconciliation_keys(documento, numero)
+        for documento, numero in zip(df['NU_DOCUMENTO'], df['SEU_NUMERO'])
+    ]
+
     # Conectar ao MongoDB
     client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
     # Verificar conexão
@@ -79,27 +78,23 @@ try:
     # Limpar a collection existente
     db = client['investment_funds']
     collection = db['stock']
-    collection.delete_many({})
+    # drop remove também os índices, para a carga não atualizar índices a cada lote
+    collection.drop()
     print("Collection anterior removida com sucesso")
     
     # Usar banco de dados específico para fundos de investimentos
     db = client['investment_funds']
     collection = db['stock']
 
-    # Converter DataFrame para lista de dicionários e inserir no MongoDB
-    records = df.to_dict('records')
-    result = collection.insert_many(records)
+    # Converter o DataFrame em registros por fatias (NaN/NaT viram None) e inserir em lotes paralelos
+    records = iter_records(df)
+    stats = bulk_insert(collection, records)
 
-    print(f'Foram inseridos {len(result.inserted_ids)} documentos no MongoDB no banco investment_funds')
+    print(f"Foram inseridos {stats['inserted']} documentos no MongoDB no banco investment_funds "
+          f"({stats['docs_per_sec']:,.0f} docs/s)")
+    load_stats = {**stats, 'expected': len(df)}
 
-    # Criar índices para melhorar a performance das consultas
-    collection.create_index([("NOME_FUNDO", 1)])
-    collection.create_index([("DOC_FUNDO", 1)])
-    collection.create_index([("NOME_SACADO", 1)])
-    collection.create_index([("SEU_NUMERO", 1)])
-    collection.create_index([("DATA_VENCIMENTO_ORIGINAL", 1)])
-    collection.create_index([("SITUACAO_RECEBIVEL", 1)])
-    print("Índices criados com sucesso no banco investment_funds")
+    # Os índices são criados depois de todas as cargas, na fase de indexação (index_spec.py)
 
     # Mostrar um exemplo dos dados inseridos para validação
     # print("\nExemplo do primeiro registro inserido no banco stock:")